@@ -0,0 +1,452 @@
+"""
+Benchmarks for uniQword's hot paths. Run with python benchmark.py.
+A synthetic corpus is generated in every supported format, always the same for the same options, and the results are
+written to a JSON file which later runs can be compared against, e.g.:
+    python benchmark.py --output baseline.json
+    python benchmark.py --output new.json --baseline baseline.json
+"""
+
+import argparse  # Used to read the command-line options.
+import collections  # Used to count the words of the corpus.
+import itertools  # Used to build the synthetic vocabulary.
+import json  # Used to store the results.
+import os  # Used to write the corpus.
+import platform  # Used to record where the results were measured.
+import random  # Used to generate reproducible sample texts.
+import re  # Used by the reference tokenizer.
+import sys  # Used for the exit code and to report skipped benchmarks.
+import tempfile  # Used to store the corpus when no directory is given.
+import time  # Used to time operations.
+import tracemalloc  # Used to measure peak memory.
+import zipfile  # Used to write docx and odt files.
+from xml.sax.saxutils import escape  # Used to write docx and odt files.
+
+import uniqword
+
+# Characters used to build sample texts, weighted towards letters like real prose.
+SAMPLE_ALPHABET = "abcdefghijklmnopqrstuvwxyz" * 4 + "ÀéüßΣς0123456789" + "-_'.,;:!?\"()" + " " * 12 + "\n\t"
+
+# Characters used to build the words of the synthetic corpus. Only Latin-1, so that they can be written in PDFs.
+CORPUS_ALPHABET = "etaoinshrdlucmfwypvbgkjqxzéàüß"
+
+# Punctuation following some words of the synthetic corpus, and the hyphens and apostrophes inside some of them.
+CORPUS_PUNCTUATION = (".", ",", ";", ":", "!", "?")
+
+# Words per line and lines per paragraph (or PDF page) of the synthetic corpus.
+CORPUS_LINE = 12
+CORPUS_PARAGRAPH = 40
+
+# The result of each benchmark is the fastest of its runs; results this much slower than the baseline are reported.
+TOLERANCE = 0.1
+
+# How many files the corpus is split into to measure adding and removing files in a collection.
+CHURN_FILES = 50
+
+
+def reference_purify_words(contents: str) -> list:
+    """
+    The original per-character implementation of WordsFile.purify_words, kept to check the compiled one against.
+    :param contents: the string to purify.
+    :return: a list of purified words.
+    """
+
+    all_words = []
+
+    for word in filter(lambda w: w not in ["", "\n"], re.split(r"["+uniqword.SEPARATORS+r"]", contents)):
+        word = [char for char in word if char.isalnum() or char in uniqword.ACCEPT]
+        while len(word):
+            if word[0] in uniqword.REMOVE:
+                word.pop(0)
+                continue
+            if word[-1] in uniqword.REMOVE:
+                word.pop(-1)
+                continue
+
+            all_words.append("".join(word))
+            break
+
+    return all_words
+
+
+def sample_text(size: int, seed: int = 0) -> str:
+    """
+    Generate a reproducible pseudo-text.
+    :param size: the amount of characters to generate.
+    :param seed: the seed for the random generator.
+    :return: the generated text.
+    """
+
+    generator = random.Random(seed)
+    return "".join(generator.choices(SAMPLE_ALPHABET, k=size))
+
+
+def throughput(function, text: str, repeat: int) -> float:
+    """
+    Measure how fast a tokenizer processes text.
+    :param function: the tokenizer to call on the text.
+    :param text: the text to tokenize.
+    :param repeat: how many times to repeat the measurement; the fastest run is kept.
+    :return: the throughput in MB/s of UTF-8 text.
+    """
+
+    size = len(text.encode("UTF-8")) / 1024 / 1024
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return size / best
+
+
+def synthetic_vocabulary(size: int) -> list:
+    """
+    Build a vocabulary of distinct made-up words, shortest first like the most common words of real languages.
+    Some words contain a hyphen or an apostrophe, to exercise the tokenizer.
+    :param size: the amount of words.
+    :return: the list of words, from the most to the least common.
+    """
+
+    words = []
+    for length in itertools.count(1):
+        for letters in itertools.product(CORPUS_ALPHABET, repeat=length):
+            word = "".join(letters)
+            if len(word) > 3 and len(words) % 17 == 0:
+                word = word[:2] + "-" + word[2:]
+            elif len(word) > 3 and len(words) % 23 == 0:
+                word = word[:1] + "'" + word[1:]
+
+            words.append(word)
+            if len(words) == size:
+                return words
+
+
+def zipf_words(count: int, vocabulary: int, exponent: float, seed: int = 0) -> list:
+    """
+    Generate a sequence of words whose frequencies follow Zipf's law, as in natural languages.
+    :param count: the amount of words to generate.
+    :param vocabulary: the amount of different words to choose from.
+    :param exponent: the exponent of the distribution. Higher values make the most common words more dominant.
+    :param seed: the seed for the random generator.
+    :return: the list of words.
+    """
+
+    generator = random.Random(seed)
+    words = synthetic_vocabulary(vocabulary)
+    weights = list(itertools.accumulate(1 / rank ** exponent for rank in range(1, vocabulary + 1)))
+
+    return generator.choices(words, cum_weights=weights, k=count)
+
+
+def corpus_paragraphs(words: list, seed: int = 0) -> list:
+    """
+    Arrange words into paragraphs of lines, with some punctuation and capital letters.
+    :param words: the words to arrange.
+    :param seed: the seed for the random generator.
+    :return: a list of paragraphs, each a list of lines.
+    """
+
+    generator = random.Random(seed)
+    lines = []
+
+    for start in range(0, len(words), CORPUS_LINE):
+        line = []
+        for word in words[start:start + CORPUS_LINE]:
+            if generator.random() < 0.05:
+                word = word.capitalize()
+            if generator.random() < 0.1:
+                word += generator.choice(CORPUS_PUNCTUATION)
+            line.append(word)
+        lines.append(" ".join(line))
+
+    return [lines[start:start + CORPUS_PARAGRAPH] for start in range(0, len(lines), CORPUS_PARAGRAPH)]
+
+
+def write_txt(file_path: str, paragraphs: list):
+    """Write a plain text file, with an empty line between paragraphs."""
+    with open(file_path, "w", encoding="UTF-8") as file:
+        file.write("\n\n".join("\n".join(lines) for lines in paragraphs))
+
+
+def write_docx(file_path: str, paragraphs: list):
+    """Write a minimal DOCX document, with a line break after each line."""
+    body = "".join("<w:p><w:r>" + "<w:br/>".join(f"<w:t>{escape(line)}</w:t>" for line in lines) + "</w:r></w:p>"
+                   for lines in paragraphs)
+
+    with zipfile.ZipFile(file_path, "w", zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr("[Content_Types].xml",
+                      '<?xml version="1.0" encoding="UTF-8"?>'
+                      '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                      '<Default Extension="xml" ContentType="application/xml"/>'
+                      '<Override PartName="/word/document.xml" ContentType="application/'
+                      'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>')
+        docx.writestr("word/document.xml",
+                      '<?xml version="1.0" encoding="UTF-8"?>'
+                      '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                      f"<w:body>{body}</w:body></w:document>")
+
+
+def write_odt(file_path: str, paragraphs: list):
+    """Write a minimal ODT document, with a line break after each line."""
+    body = "".join("<text:p>" + "<text:line-break/>".join(escape(line) for line in lines) + "</text:p>"
+                   for lines in paragraphs)
+
+    with zipfile.ZipFile(file_path, "w", zipfile.ZIP_DEFLATED) as odt:
+        odt.writestr("mimetype", "application/vnd.oasis.opendocument.text", zipfile.ZIP_STORED)
+        odt.writestr("content.xml",
+                     '<?xml version="1.0" encoding="UTF-8"?>'
+                     '<office:document-content xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+                     'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0">'
+                     f"<office:body><office:text>{body}</office:text></office:body></office:document-content>")
+
+
+def write_pdf(file_path: str, paragraphs: list):
+    """
+    Write a minimal PDF document, one page per paragraph.
+    Each line ends in a space, since line breaks don't separate the words of PDFs.
+    """
+    def pdf_string(line: str) -> bytes:
+        """:return: the line as a PDF literal string."""
+        return b"(" + line.encode("latin-1").replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+    pages = len(paragraphs)
+    # Objects: the catalog, the page tree, the font, then a page and its contents for each paragraph.
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>",
+               b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % (4 + 2 * page) for page in range(pages))
+               + b"] /Count %d >>" % pages,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+
+    for page, lines in enumerate(paragraphs):
+        contents = (b"BT /F1 10 Tf 12 TL 40 800 Td " + b" ".join(pdf_string(line + " ") + b" Tj T*" for line in lines)
+                    + b" ET")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> "
+                       b"/Contents %d 0 R >>" % (5 + 2 * page))
+        objects.append(b"<< /Length %d >>\nstream\n" % len(contents) + contents + b"\nendstream")
+
+    with open(file_path, "wb") as pdf:
+        pdf.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, content in enumerate(objects, 1):
+            offsets.append(pdf.tell())
+            pdf.write(b"%d 0 obj\n" % number + content + b"\nendobj\n")
+
+        xref = pdf.tell()
+        pdf.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        pdf.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+        pdf.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+# The writer of each supported format of the synthetic corpus.
+CORPUS_WRITERS = {".txt": write_txt, ".docx": write_docx, ".odt": write_odt, ".pdf": write_pdf}
+
+
+def generate_corpus(directory: str, words: int, vocabulary: int, exponent: float, seed: int = 0) -> dict:
+    """
+    Write the same synthetic text in every supported format.
+    :param directory: the directory to write the files in.
+    :param words: the amount of words of the text.
+    :param vocabulary: the amount of different words to choose from.
+    :param exponent: the exponent of the Zipf distribution of the words.
+    :param seed: the seed for the random generator.
+    :return: a dictionary of the path of each file, by format.
+    """
+
+    paragraphs = corpus_paragraphs(zipf_words(words, vocabulary, exponent, seed), seed)
+    paths = {}
+
+    for extension, writer in CORPUS_WRITERS.items():
+        paths[extension] = os.path.join(directory, f"corpus{extension}")
+        writer(paths[extension], paragraphs)
+
+    return paths
+
+
+def measure(function, repeat: int) -> float:
+    """
+    Time a function.
+    :param function: the function to call without arguments.
+    :param repeat: how many times to call it; the fastest run is kept.
+    :return: the time of the fastest run in seconds.
+    """
+
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def peak_memory(function) -> int:
+    """
+    Measure the memory a function needs. Only memory allocated by Python is seen, not e.g. by lxml's own C code.
+    :param function: the function to call without arguments.
+    :return: the peak of the memory allocated during the call, in bytes.
+    """
+
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def churn(files: list):
+    """Add files to a collection, remove half of them, then add them back, as a user would while exploring a corpus."""
+    collection = uniqword.FilesCollection()
+    collection.add_files(*files)
+    collection.remove_files(*[file.file_path for file in files[::2]])
+    collection.add_files(*files[::2])
+
+
+def run_benchmarks(paths: dict, repeat: int, seed: int = 0) -> dict:
+    """
+    Measure every benchmark on a synthetic corpus.
+    :param paths: the path of the corpus file of each format, see generate_corpus.
+    :param repeat: how many times to run each benchmark; the fastest run is kept.
+    :param seed: the seed for the generated samples.
+    :return: a dictionary of the results of each benchmark, by name. Each result has its time in "seconds" and, where
+    meaningful, its throughput in "mb_per_s" and its peak memory in "peak_bytes".
+    """
+
+    results = {}
+
+    for extension, file_path in paths.items():
+        size = os.path.getsize(file_path) / 1024 / 1024
+        try:
+            seconds = measure(lambda: uniqword.WordsFile(file_path, ""), repeat)
+        except Exception as error:  # E.g. an incompatible version of the format's library: measure the rest anyway.
+            print(f"Skipping ingest{extension}: {error.__class__.__name__} {error}", file=sys.stderr)
+            continue
+        results[f"ingest{extension}"] = {
+            "seconds": seconds,
+            "mb_per_s": size / seconds,
+            "peak_bytes": peak_memory(lambda: uniqword.WordsFile(file_path, "")),
+        }
+
+    with open(paths[".txt"], encoding="UTF-8") as file:
+        text = file.read()
+
+    for name, tokenizer in [("tokenize", uniqword.WordsFile.purify_words),
+                            ("tokenize.reference", reference_purify_words),
+                            ("tokenize.random", uniqword.WordsFile.purify_words)]:
+        sample = sample_text(len(text), seed) if name == "tokenize.random" else text
+        seconds = measure(lambda: tokenizer(sample), repeat)
+        results[name] = {"seconds": seconds, "mb_per_s": len(sample.encode("UTF-8")) / 1024 / 1024 / seconds}
+
+    words = uniqword.WordsFile.purify_words(text)
+    results["count"] = {"seconds": measure(lambda: uniqword.WordsFile.from_counts("", collections.Counter())
+                                           .store_words(words), repeat)}
+    results["count.keep_words"] = {
+        "seconds": measure(lambda: uniqword.WordsFile.from_counts("", collections.Counter(), uniqword.array.array("I"))
+                           .store_words(words), repeat),
+    }
+
+    counts = collections.Counter(words)
+    for name, options in [("frequency", {}), ("frequency.top", {"top": uniqword.FREQUENCY_TOP}),
+                          ("frequency.top.reverse", {"top": uniqword.FREQUENCY_TOP, "reverse": True}),
+                          ("frequency.page", {"top": uniqword.FREQUENCY_TOP, "offset": 10 * uniqword.FREQUENCY_TOP})]:
+        results[name] = {"seconds": measure(lambda: uniqword.select_frequency(counts, **options), repeat)}
+
+    # Split the words into files of consecutive words, as if they came from many shorter documents.
+    step = -(-len(words) // CHURN_FILES)
+    files = [uniqword.WordsFile.from_counts(f"file{index}", collections.Counter(words[start:start + step]))
+             for index, start in enumerate(range(0, len(words), step))]
+    results["collection.churn"] = {"seconds": measure(lambda: churn(files), repeat),
+                                   "peak_bytes": peak_memory(lambda: churn(files))}
+
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float = TOLERANCE) -> list:
+    """
+    Compare results against a baseline.
+    :param results: the results of each benchmark, see run_benchmarks.
+    :param baseline: the results of a previous run.
+    :param tolerance: how much slower, or bigger, a result may be than the baseline before it is reported, e.g. 0.1
+    for 10%.
+    :return: a list of (benchmark, measure, baseline value, new value, ratio) for each result beyond the tolerance.
+    """
+
+    regressions = []
+
+    for name, result in results.items():
+        for measure_name in ("seconds", "peak_bytes"):
+            old = baseline.get(name, {}).get(measure_name)
+            new = result.get(measure_name)
+            if old and new is not None and new / old > 1 + tolerance:
+                regressions.append((name, measure_name, old, new, new / old))
+
+    return regressions
+
+
+def main() -> int:
+    """
+    Run the benchmarks and print the results.
+    :return: the exit code, 1 if any result is worse than the baseline.
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=200000, help="words of the synthetic corpus")
+    parser.add_argument("--vocabulary", type=int, default=20000, help="different words of the synthetic corpus")
+    parser.add_argument("--zipf", type=float, default=1.1, help="exponent of the Zipf distribution of the words")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the fastest is kept")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the generated samples")
+    parser.add_argument("--corpus", help="directory to write the corpus in and keep it, instead of a temporary one")
+    parser.add_argument("--output", help="JSON file to write the results in")
+    parser.add_argument("--baseline", help="JSON file of previous results to compare against")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="how much worse than the baseline a result may be, e.g. 0.1 for 10%%")
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if options.corpus:
+            directory = options.corpus
+            os.makedirs(directory, exist_ok=True)
+
+        paths = generate_corpus(directory, options.words, options.vocabulary, options.zipf, options.seed)
+        results = run_benchmarks(paths, options.repeat, options.seed)
+
+    for name, result in results.items():
+        line = f"{name:24}{result['seconds'] * 1000:10.2f} ms"
+        if "mb_per_s" in result:
+            line += f"{result['mb_per_s']:10.2f} MB/s"
+        if "peak_bytes" in result:
+            line += f"{result['peak_bytes'] / 1024 / 1024:10.2f} MB peak"
+        print(line)
+
+    if options.output:
+        with open(options.output, "w") as file:
+            json.dump({
+                "options": {name: value for name, value in vars(options).items()
+                            if name in ("words", "vocabulary", "zipf", "repeat", "seed")},
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": results,
+            }, file, indent=2)
+
+    if not options.baseline:
+        return 0
+
+    with open(options.baseline) as file:
+        baseline = json.load(file)
+    if {name: value for name, value in vars(options).items() if name in baseline["options"]} != baseline["options"]:
+        print("Warning: the baseline was measured with different options.")
+
+    regressions = compare(results, baseline["results"], options.tolerance)
+    for name, measure_name, old, new, ratio in regressions:
+        print(f"Regression: {name} {measure_name} went from {old:.6g} to {new:.6g} ({ratio - 1:+.0%}).")
+    if not regressions:
+        print(f"No result is more than {options.tolerance:.0%} worse than the baseline.")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
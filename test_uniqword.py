@@ -0,0 +1,472 @@
+"""
+Tests for uniQword. Run with python -m pytest.
+The fast implementations are checked against simpler reference ones on reproducible random inputs, and the features
+on small documents and collections.
+"""
+
+import array  # Used to keep the words of files in order.
+import asyncio  # Used to run the asynchronous pipeline.
+import codecs  # Used to check the preferred encoding.
+import collections  # Used to count the words of files.
+import fnmatch  # Used to check the words matching wildcards.
+import json  # Used to read the output of the batch interface.
+import locale  # Used to check the preferred encoding.
+import math  # Used to compute the expected scores of files.
+import random  # Used to generate reproducible random inputs.
+import re  # Used to check the words matching regular expressions.
+import zipfile  # Used to write docx and odt files.
+
+import pytest
+
+import uniqword
+from benchmark import reference_purify_words, sample_text
+
+# How many random inputs each equivalence test compares.
+SAMPLES = 2000
+
+# The preferred encoding must be UTF-8 for plain text files to be mapped in memory.
+UTF8 = codecs.lookup(locale.getpreferredencoding(False)).name == "utf-8"
+
+
+def test_tokenizer_bmp():
+    """
+    The whole of the Basic Multilingual Plane, to cover unusual alphanumeric characters.
+    """
+
+    text = "".join(chr(code) for code in range(0x10000) if not 0xD800 <= code <= 0xDFFF)
+    assert uniqword.WordsFile.purify_words(text) == reference_purify_words(text)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_tokenizer_random(seed):
+    """
+    The compiled tokenizer gives exactly the same words as the original per-character one.
+    """
+
+    generator = random.Random(seed)
+
+    for index in range(SAMPLES // 4):
+        text = sample_text(generator.randint(0, 200), seed * SAMPLES + index)
+        assert uniqword.WordsFile.purify_words(text) == reference_purify_words(text), text
+
+
+@pytest.mark.parametrize("join_lines", [False, True])
+@pytest.mark.parametrize("seed", range(4))
+def test_stream_words(seed, join_lines):
+    """
+    Purifying text in chunks of any size gives the same words as purifying it whole, even across long runs of text
+    without whitespace.
+    """
+
+    generator = random.Random(seed)
+    file = uniqword.WordsFile
+    purify = file.purify_joined_lines if join_lines else lambda text: file.purify_words(text.lower())
+
+    for index in range(SAMPLES // 20):
+        text = sample_text(generator.randint(0, 500), seed * SAMPLES + index)
+        if generator.random() < 0.5:
+            text = text.replace(" ", "")  # Long runs without spaces, carried over many chunks.
+        size = generator.randint(1, 30)
+        chunks = [text[start:start + size] for start in range(0, len(text), size)]
+
+        assert list(uniqword.WordsFile.stream_words(chunks, join_lines)) == purify(text), text
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_numpy_select_frequency(seed):
+    """
+    Selecting the frequency list with NumPy gives the same words in the same order as the pure Python selection.
+    """
+
+    pytest.importorskip("numpy")
+    generator = random.Random(seed)
+
+    for _ in range(SAMPLES // 20):
+        # Few different frequencies, so that many words are tied.
+        counts = {f"w{index}": generator.randint(1, 10) for index in range(generator.randint(0, 300))}
+        options = dict(top=generator.randint(0, 50), reverse=generator.random() < 0.5, minimum=generator.randint(1, 4),
+                       offset=generator.randint(0, 20), ties=generator.random() < 0.5)
+
+        expected = uniqword.select_frequency(counts, **options)  # Small enough not to use NumPy.
+        assert uniqword.numpy_select_frequency(counts, **options) == expected, options
+
+
+@pytest.mark.skipif(not UTF8, reason="plain text files are only mapped in memory with a UTF-8 locale")
+@pytest.mark.parametrize("keep_words", [False, True])
+@pytest.mark.parametrize("seed", range(4))
+def test_mapped_text(tmp_path, monkeypatch, seed, keep_words):
+    """
+    Counting a mapped text file in small chunks gives the same words in the same order as decoding it all at once.
+    """
+
+    monkeypatch.setattr(uniqword, "CHUNK_SIZE", 64)
+    generator = random.Random(seed)
+    path = str(tmp_path / "sample.txt")
+
+    for index in range(SAMPLES // 40):
+        text = sample_text(generator.randint(0, 2000), seed * SAMPLES + index)
+        if generator.random() < 0.5:
+            text = text.encode("ASCII", "ignore").decode()  # Pure ASCII chunks are tokenized as bytes.
+        with open(path, "w", encoding="UTF-8", newline="") as file:
+            file.write(text)
+
+        expected = uniqword.WordsFile.from_counts(path, collections.Counter(), array.array("I") if keep_words else None)
+        expected.store_words(expected.stream_words([text]))
+        actual = uniqword.WordsFile(path, "", keep_words)
+
+        assert list(actual.file_counts.items()) == list(expected.file_counts.items()), text
+        assert actual.get_words() == expected.get_words(), text
+
+
+@pytest.mark.skipif(not UTF8, reason="plain text files are only mapped in memory with a UTF-8 locale")
+def test_mapped_text_ranges(tmp_path, monkeypatch):
+    """
+    Splitting a mapped text file across processes gives the same words in the same order as reading it in one.
+    """
+
+    text = sample_text(20000, 1)
+    path = str(tmp_path / "sample.txt")
+    with open(path, "w", encoding="UTF-8", newline="") as file:
+        file.write(text)
+
+    expected = uniqword.WordsFile(path, "", True)
+    monkeypatch.setattr(uniqword, "TEXT_BYTES_PER_WORKER", 1000)
+    actual = uniqword.WordsFile(path, "", True, workers=4)
+
+    assert list(actual.file_counts.items()) == list(expected.file_counts.items())
+    assert actual.get_words() == expected.get_words()
+
+
+def test_cache_size(tmp_path):
+    """
+    The cache keeps track of its size across puts and replacements, and forgets the least recently used files first.
+    """
+
+    paths = []
+    for index in range(50):
+        paths.append(str(tmp_path / f"file{index}.txt"))
+        with open(paths[-1], "w", encoding="UTF-8") as file:
+            file.write(f"word{index} shared")
+
+    cache = uniqword.ExtractionCache(str(tmp_path / "cache"), max_size=1000)
+    for index, path in enumerate(paths):
+        cache.put(path, collections.Counter({f"word{index}": 1, "shared": 1}))
+    cache.put(paths[-1], collections.Counter({"replaced": 2}))
+
+    stored = cache.database.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM files").fetchone()[0]
+    assert cache.size == stored <= 1000
+    assert cache.get(paths[0]) is None
+    assert cache.get(paths[-1]) == (collections.Counter({"replaced": 2}), None)
+
+    files = list(uniqword.read_files(paths, workers=4, threads=True, cache=cache))
+    assert [file.file_path for file in files] == paths
+    assert [file.file_counts for file in files[:-1]] == [collections.Counter({f"word{index}": 1, "shared": 1})
+                                                         for index in range(49)]
+    cache.close()
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_external_collection(tmp_path, monkeypatch, seed):
+    """
+    Counting externally with a small budget gives the same results as counting in memory, in the same order.
+    """
+
+    monkeypatch.setattr(uniqword, "SPILL_INDEX_STEP", 4)  # Small blocks, so that words are looked up across many.
+    monkeypatch.setattr(uniqword, "SPILL_MERGE_WIDTH", 3)  # Runs are merged a few times too.
+    generator = random.Random(seed)
+    vocabulary = list(dict.fromkeys(uniqword.WordsFile.purify_words(sample_text(3000, seed).lower())))
+    files = [uniqword.WordsFile.from_counts(f"file{index}", collections.Counter(generator.choices(vocabulary, k=200)))
+             for index in range(20)]
+
+    memory = uniqword.FilesCollection(*files)
+    external = uniqword.FilesCollection()
+    external.make_external(uniqword.SpillingCounter(budget=40 * uniqword.SPILL_WORD_SIZE, directory=str(tmp_path)))
+    for file in files:
+        external.add_files(uniqword.WordsFile.from_counts(file.file_path, collections.Counter(file.file_counts)))
+
+    assert len(external.external.runs) > 1
+    assert external.count_collective_words() == memory.count_collective_words()
+    assert external.count_collective_unique_words() == memory.count_collective_unique_words()
+    for word in vocabulary + ["", "missing", "￿"]:
+        assert external.count_collective_word(word) == memory.count_collective_word(word), word
+    for top, reverse, options in [(0, False, {}), (10, False, {}), (10, True, {}), (5, False, {"ties": True}),
+                                  (10, False, {"offset": 7, "minimum": 3})]:
+        assert external.get_frequency(top, reverse, **options) == memory.get_frequency(top, reverse, **options)
+
+
+@pytest.mark.parametrize("mode", ["make_approximate", "make_external"])
+def test_merge_keeps_other(mode):
+    """
+    Merging into an approximate or external collection leaves the files of the other collection as they were.
+    """
+
+    other = uniqword.FilesCollection(uniqword.WordsFile.from_counts("a", collections.Counter({"one": 2, "two": 1})),
+                                     uniqword.WordsFile.from_counts("b", collections.Counter({"two": 3})))
+    collection = uniqword.FilesCollection(uniqword.WordsFile.from_counts("c", collections.Counter({"three": 1})))
+    getattr(collection, mode)()
+    collection.merge(other)
+
+    assert other.files["a"].file_counts == collections.Counter({"one": 2, "two": 1})
+    assert other.get_frequency(0) == [("two", 4), ("one", 2)]
+    assert collection.count_collective_words() == 7
+    assert collection.count_collective_word("two") == 4
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_collection_remove(seed):
+    """
+    Removing files, or adding a new version of one, leaves the same counts as adding only the files which remain.
+    """
+
+    generator = random.Random(seed)
+    vocabulary = [f"w{index}" for index in range(50)]
+    files = [uniqword.WordsFile.from_counts(f"file{index}", collections.Counter(generator.choices(vocabulary, k=100)))
+             for index in range(10)]
+
+    collection = uniqword.FilesCollection(*files)
+    removed = generator.sample(range(10), 4)
+    assert collection.remove_files(*[f"file{index}" for index in removed]) == 4
+    replacement = uniqword.WordsFile.from_counts("file0", collections.Counter(generator.choices(vocabulary, k=30)))
+    collection.add_files(replacement)
+
+    remaining = [replacement] + [file for index, file in enumerate(files) if index not in removed and index]
+    expected = uniqword.FilesCollection(*remaining)
+    assert collection.collective_counts == expected.collective_counts
+    assert all(collection.collective_counts.values())  # Words which are gone are forgotten, not kept at 0.
+    assert collection.count_collective_words() == expected.count_collective_words()
+    assert collection.count_collective_unique_words() == expected.count_collective_unique_words()
+    assert collection.files.keys() == expected.files.keys()
+
+
+def reference_frequency(counts: dict, top: int, reverse: bool, minimum: int, offset: int, ties: bool) -> list:
+    """:return: the frequency list by a stable sort of the whole vocabulary, see select_frequency."""
+    entries = sorted((entry for entry in counts.items() if entry[1] >= minimum), key=lambda entry: entry[1],
+                     reverse=not reverse)
+    if not top:
+        return entries[offset:]
+
+    end = offset + top
+    if ties and end <= len(entries):
+        while end < len(entries) and entries[end][1] == entries[offset + top - 1][1]:
+            end += 1
+
+    return entries[offset:end]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_select_frequency(seed):
+    """
+    Selecting part of the frequency list through a heap gives the same list as sorting all the words.
+    """
+
+    generator = random.Random(seed)
+
+    for _ in range(SAMPLES // 20):
+        # Few different frequencies, so that many words are tied.
+        counts = {f"w{index}": generator.randint(1, 10) for index in range(generator.randint(0, 100))}
+        options = dict(top=generator.randint(0, 30), reverse=generator.random() < 0.5, minimum=generator.randint(1, 4),
+                       offset=generator.randint(0, 20), ties=generator.random() < 0.5)
+
+        assert uniqword.select_frequency(counts, **options) == reference_frequency(counts, **options), options
+
+
+def write_zip(file_path: str, name: str, xml: str) -> str:
+    """
+    Write a document made of a single XML part, e.g. an ODT or DOCX document with only its text.
+    :return: the file path.
+    """
+
+    with zipfile.ZipFile(file_path, "w") as document:
+        document.writestr(name, '<?xml version="1.0" encoding="UTF-8"?>' + xml)
+
+    return file_path
+
+
+def test_odt_text(tmp_path):
+    """
+    The words of different paragraphs, tabs, line breaks and footnotes of ODT documents are kept apart, and those
+    split across inline elements like spans are joined.
+    """
+
+    pytest.importorskip("lxml")
+    body = ("<text:p>Foot<text:span>note</text:span>d<text:note><text:note-citation>1</text:note-citation>"
+            "<text:note-body><text:p>Note text</text:p></text:note-body></text:note> after, in<text:span>line"
+            "</text:span>d</text:p><text:p>end</text:p><text:h>start<text:tab/>tab<text:line-break/>break</text:h>")
+    path = write_zip(str(tmp_path / "sample.odt"), "content.xml",
+                     '<office:document-content xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+                     'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"><office:body><office:text>'
+                     f"{body}</office:text></office:body></office:document-content>")
+
+    assert uniqword.WordsFile(path, "", True).get_words() == ["footnoted", "1", "note", "text", "after", "inlined",
+                                                              "end", "start", "tab", "break"]
+
+
+def test_docx_text(tmp_path):
+    """
+    The words of different paragraphs, tabs and text boxes of DOCX documents are kept apart, those split across runs
+    are joined, and the fallback copies of text boxes are not counted.
+    """
+
+    pytest.importorskip("lxml")
+    box = "<w:txbxContent><w:p><w:r><w:t>boxed</w:t></w:r></w:p></w:txbxContent>"
+    body = ("<w:p><w:r><w:t>body</w:t></w:r><w:r><mc:AlternateContent><mc:Choice Requires=\"wps\"><w:drawing>"
+            f"<wps:txbx>{box}</wps:txbx></w:drawing></mc:Choice><mc:Fallback><w:pict><v:textbox>{box}</v:textbox>"
+            "</w:pict></mc:Fallback></mc:AlternateContent></w:r><w:r><w:t>ma</w:t></w:r><w:r><w:t>in</w:t></w:r></w:p>"
+            "<w:p><w:r><w:t>end</w:t></w:r></w:p><w:p><w:r><w:t>start</w:t><w:tab/><w:t>tab</w:t></w:r></w:p>")
+    path = write_zip(str(tmp_path / "sample.docx"), "word/document.xml",
+                     '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+                     'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006" '
+                     'xmlns:v="urn:schemas-microsoft-com:vml" '
+                     'xmlns:wps="http://schemas.microsoft.com/office/word/2010/wordprocessingShape">'
+                     f"<w:body>{body}</w:body></w:document>")
+
+    assert uniqword.WordsFile(path, "", True).get_words() == ["body", "boxed", "main", "end", "start", "tab"]
+
+
+def write_text(file_path: str, text: str) -> str:
+    """
+    Write a plain text file in UTF-8.
+    :return: the file path.
+    """
+
+    with open(file_path, "w", encoding="UTF-8", newline="") as file:
+        file.write(text)
+
+    return file_path
+
+
+def test_batch_output(tmp_path, capsys):
+    """
+    The batch interface writes the same results as JSON and CSV, and reports unreadable files while counting the rest.
+    """
+
+    first = write_text(str(tmp_path / "first.txt"), "The cat and the dog.\n")
+    second = write_text(str(tmp_path / "second.txt"), "the end")
+    unsupported = write_text(str(tmp_path / "unsupported.xyz"), "not read")
+
+    arguments = ["--workers", "1", first, second]
+    assert uniqword.BatchInterface(["count", "--format", "json"] + arguments).run() == 0
+    assert json.loads(capsys.readouterr().out) == {"files": 2, "words": 7, "unique": 5}
+
+    assert uniqword.BatchInterface(["frequency", "--top", "2", "--format", "json"] + arguments).run() == 0
+    assert json.loads(capsys.readouterr().out) == [{"word": "the", "count": 3}, {"word": "cat", "count": 1}]
+
+    assert uniqword.BatchInterface(["frequency", "--top", "2", "--format", "csv"] + arguments).run() == 0
+    assert capsys.readouterr().out.splitlines() == ["word,count", "the,3", "cat,1"]
+
+    assert uniqword.BatchInterface(["count", "--format", "csv", first, unsupported, second]).run() == 1
+    output = capsys.readouterr()
+    assert output.out.splitlines() == ["files,words,unique", "2,7,5"]
+    assert "unsupported.xyz" in output.err
+
+
+def test_stream_windows():
+    """
+    Rolling windows only count the last words, or the words of the last seconds, while the stream counts them all.
+    """
+
+    stream = uniqword.WordsStream("test", [uniqword.RollingWindow(tokens=3), uniqword.RollingWindow(seconds=10)])
+    stream.add_line("one two\n", now=0)
+    stream.add_line("Two three\n", now=5)
+    stream.add_line("four\n", now=12)
+
+    assert stream.get_frequency(0) == [("two", 2), ("one", 1), ("three", 1), ("four", 1)]
+    assert dict(stream.windows[0].counts) == {"two": 1, "three": 1, "four": 1}
+    assert dict(stream.windows[1].counts) == {"two": 1, "three": 1, "four": 1}  # The words at 0 s are too old.
+
+    stream.windows[1].expire(now=15)
+    assert dict(stream.windows[1].counts) == {"four": 1}
+    assert len(stream.windows[1]) == 1
+
+    snapshot = stream.snapshot(1)
+    assert (snapshot["lines"], snapshot["words"], snapshot["unique"]) == (3, 5, 4)
+    assert snapshot["windows"][0]["frequency"] == [("two", 1)]
+
+
+def test_index_and_rank():
+    """
+    The index finds the files and positions of words as files are added and removed, and ranks files by TF-IDF.
+    """
+
+    def words_file(file_path: str, text: str) -> uniqword.WordsFile:
+        """:return: a file of the words of the text, with their positions."""
+        words = text.split()
+        return uniqword.WordsFile.from_counts(file_path, collections.Counter(words), uniqword.VOCABULARY.encode(words))
+
+    collection = uniqword.FilesCollection(words_file("a", "apple apple banana"), words_file("b", "banana cherry"),
+                                          words_file("c", "cherry cherry date cherry"))
+
+    assert collection.get_word_files("banana") == {"a": 1, "b": 1}
+    assert collection.count_word_files("cherry") == 2
+    assert list(collection.get_word_positions("cherry", "c")) == [0, 1, 3]
+    assert collection.rank_files("apple") == [("a", pytest.approx(2 / 3 * (math.log(4 / 2) + 1)))]
+    assert [file_path for file_path, _ in collection.rank_files("cherry", top=0)] == ["c", "b"]
+    assert [file_path for file_path, _ in collection.rank_files("cherry", "banana", top=0)] == ["b", "c", "a"]
+
+    collection.remove_files("a")
+    collection.add_files(words_file("d", "apple date"))
+    assert collection.get_word_files("apple") == {"d": 1}
+    assert collection.get_word_files("banana") == {"b": 1}
+    assert list(collection.get_word_positions("date", "d")) == [1]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_matching_words(seed):
+    """
+    Wildcard queries find the same words as checking every word with fnmatch, and count the sum of their occurrences.
+    """
+
+    generator = random.Random(seed)
+    words = uniqword.WordsFile.purify_words(sample_text(5000, seed).lower())
+    collection = uniqword.FilesCollection(uniqword.WordsFile.from_counts("file", collections.Counter(words)))
+    vocabulary = list(collection.collective_counts)
+
+    for _ in range(SAMPLES // 20):
+        word = generator.choice(vocabulary)
+        cut = generator.randint(0, len(word))
+        pattern = generator.choice([word[:cut] + "*", "*" + word[cut:], word[:cut] + "?" + word[cut + 1:] + "*",
+                                    word[:cut] + "[" + word[cut:cut + 1] + "xyz]*", "*" + word[cut:cut + 2] + "*",
+                                    word])
+
+        expected = {word: occurrences for word, occurrences in sorted(collection.collective_counts.items())
+                    if fnmatch.fnmatchcase(word, pattern)}
+        assert collection.get_matching_words(pattern) == expected, pattern
+        assert collection.count_matching_words(pattern) == sum(expected.values()), pattern
+
+    assert collection.get_matching_words("[ab].*", regex=True) == {
+        word: occurrences for word, occurrences in sorted(collection.collective_counts.items())
+        if re.fullmatch("[ab].*", word)}
+
+
+@pytest.mark.parametrize("threads", [True, False])
+def test_read_files_async(tmp_path, threads):
+    """
+    The asynchronous pipeline gives the same files in the same order as reading them one by one, with or without the
+    cache, and reports the same unreadable files.
+    """
+
+    paths = [write_text(str(tmp_path / f"file{index}.txt"), sample_text(random.Random(index).randint(0, 3000), index))
+             for index in range(30)]
+    paths.insert(7, write_text(str(tmp_path / "unsupported.xyz"), "not read"))
+    paths.insert(20, str(tmp_path / "missing.txt"))
+
+    def read(reader, **options) -> tuple:
+        """:return: the paths, counts and words of the files read, and the paths of the files which couldn't be."""
+        failed = []
+        files = reader(paths, keep_words=True, errors=lambda file_path, error: failed.append(file_path), **options)
+        if reader is uniqword.read_files_async:
+            async def collect() -> list:
+                """:return: the files read by the pipeline."""
+                return [file async for file in files]
+            files = asyncio.run(collect())
+
+        return [(file.file_path, list(file.file_counts.items()), file.get_words()) for file in files], failed
+
+    expected = read(uniqword.read_files, workers=1)
+    assert len(expected[0]) == 30 and expected[1] == [paths[7], paths[20]]
+
+    cache = uniqword.ExtractionCache(str(tmp_path / "cache"))
+    for _ in range(2):  # Filling the cache, then reading from it.
+        assert read(uniqword.read_files_async, workers=3, threads=threads, readahead=2, queue_size=4,
+                    cache=cache) == expected
+    cache.close()
@@ -1,24 +1,53 @@
 """uniQword is a program to read and count words from one or multiple files and perform some statistical operations."""
 
+import argparse  # Used for the batch interface.
+import array  # Used to store sequences of words compactly.
+import bisect  # Used to find words by prefix and suffix.
 import cmd  # Used for the command-line interface.
 import codecs  # Used to avoid codec problems when reading files.
 import collections  # Used for frequency counts.
+import concurrent.futures  # Used to read multiple files in parallel.
+import contextlib  # Used to measure the stages of reading files.
+import cProfile  # Used by the command-line interface to profile commands.
+import csv  # Used for the output of the batch interface.
+import fnmatch  # Used to filter files with glob patterns.
+import hashlib  # Used to recognise changed files in the cache.
+import heapq  # Used to select the most or least frequent words without sorting them all.
+import importlib  # Used to load the readers of file formats only when they are needed.
+import json  # Used to store counts in the cache and for the output of the batch interface.
+import locale  # Used to know how plain text files are encoded.
+import math  # Used to size the sketches of approximate collections.
+import mmap  # Used to read plain text files without loading them in memory.
+import operator  # Used to sort words by frequency.
 import os  # Used for directory-wide operations.
-import time  # Used by the command-line interface for sleep() when bidding farewell to the user.
-import zipfile  # Used to read odt files.
+import pstats  # Used by the command-line interface to show the profile of commands.
+import time  # Used to date cache entries and by the command-line interface for sleep() when bidding farewell.
+import zipfile  # Used to read docx and odt files.
 import re  # Used for text parsing.
-from typing import Optional  # Used for type hinting.
-
-import PyPDF2  # Used to read PDF files.
-import docx  # Used to read docx files.
-from lxml import etree  # Used to read odt files.
-
-# All currently accepted formats for files to examine.
-SUPPORTED_FORMATS = (".txt", ".docx", ".odt", ".pdf")
+import shutil  # Used to delete the temporary files of external counting.
+import sqlite3  # Used for the cache of already read files.
+import struct  # Used to save collections in a binary format.
+import tempfile  # Used to store the partial counts of external counting.
+import sys  # Used by the batch interface.
+import threading  # Used to read streams in the background.
+import tracemalloc  # Used to measure the memory needed to read files.
+import weakref  # Used to delete the temporary files of external counting once they are not needed.
+import zlib  # Used to compress the cache.
+from typing import AsyncIterator, Callable, Iterable, Iterator, Optional  # Used for type hinting.
+
+# NumPy, used if installed to compute frequency lists of large vocabularies faster. It is only imported once a
+# vocabulary is large enough, to start faster: None until then, False if it isn't installed. See import_numpy.
+NUMPY = None
+
+# The reader of each accepted format for files to examine, see register_reader.
+READERS = {}
 
 # The default number of elements for frequency lists if unspecified by user input.
 FREQUENCY_TOP = 20
 
+# The minimum amount of different words for partial frequency lists to be computed with NumPy, when it is installed.
+NUMPY_THRESHOLD = 50000
+
 # Symbols to accept within words.
 ACCEPT = ("-", "_")
 
@@ -29,38 +58,908 @@ REMOVE = ("-",)
 SEPARATORS = r"\s'"
 
 
+def symbols_class(symbols: Iterable[str], *, negate: bool = False, separators: str = "") -> str:
+    """
+    Build a regex matching one alphanumeric character or one of the given symbols.
+    :param symbols: the symbols to match besides alphanumeric characters.
+    :param negate: whether to match any character except those instead.
+    :param separators: a regex character set (like SEPARATORS) to match besides the symbols.
+    :return: the regex string.
+    """
+
+    # \w is the same as str.isalnum() plus the underscore, so the underscore must be handled separately.
+    escaped = "".join(re.escape(symbol) for symbol in symbols if symbol != "_") + separators
+
+    if "_" in symbols:
+        if not escaped:
+            return r"\W" if negate else r"\w"
+        return f"[{'^' if negate else ''}\\w{escaped}]"
+
+    if negate:
+        return f"(?:_|[^\\w{escaped}])"
+
+    return f"(?:[^\\W_]|[{escaped}])" if escaped else r"[^\W_]"
+
+
+# Match characters which are neither separators nor accepted in words: these are dropped from within words.
+REJECTED_SYMBOLS = re.compile(symbols_class(ACCEPT, negate=True, separators=SEPARATORS) + "+")
+
+# Match a whole word once rejected symbols are gone, without the symbols to remove at its start or end.
+WORD = re.compile("{edge}+(?:[{removed}]+{edge}+)*".format(
+    edge=symbols_class([symbol for symbol in ACCEPT if symbol not in REMOVE]),
+    removed="".join(re.escape(symbol) for symbol in REMOVE),
+) if REMOVE else symbols_class(ACCEPT) + "+")
+
+# The default amount of files to read in parallel. 1 reads them one at a time in the current process.
+WORKERS = 1
+
+# The default amount of files to read ahead while others are counted, and how many bytes of each at most, when files
+# are read through the asyncio pipeline, see read_files_async.
+READAHEAD = 4
+READAHEAD_SIZE = 64 * 1024 * 1024
+
+# Where to keep the cache of already read files, and how many bytes of counts it may hold at most.
+CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".uniqword")
+CACHE_SIZE = 256 * 1024 * 1024
+
+# The format of saved collections, see FilesCollection.save. The version changes whenever the format does.
+SNAPSHOT_MAGIC = b"uniQword"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<8sHHIQQ")  # Magic, version, flags, padding, metadata and vocabulary lengths.
+SNAPSHOT_WIDE_COUNTS = 1  # Flag for counts stored in 8 bytes instead of 4.
+
+# The minimum amount of pages of a PDF to read in each process when reading a single PDF in parallel.
+PDF_PAGES_PER_WORKER = 50
+
+# Elements of ODT documents which don't separate the words they contain from the surrounding text.
+ODT_INLINE = ("span", "a", "bookmark", "bookmark-start", "bookmark-end", "reference-mark", "reference-mark-start",
+              "reference-mark-end", "soft-page-break", "change-start", "change-end", "ruby", "ruby-base")
+
+# Parts of DOCX documents to read besides the main text, as patterns of their names inside the file.
+DOCX_PARTS = ("word/header*.xml", "word/footer*.xml", "word/footnotes.xml", "word/endnotes.xml")
+
+# Elements of DOCX documents which separate words: paragraphs, tabs and line breaks.
+DOCX_SEPARATORS = ("p", "tab", "br", "cr")
+
+# Elements of DOCX documents whose text is ignored: fallback copies of text boxes and other content for old readers,
+# which Word writes besides the content itself.
+DOCX_SKIPPED = ("{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback",)
+
+# The amount of characters to read at once from plain text files.
+CHUNK_SIZE = 1024 * 1024
+
+# Match everything up to and including the last whitespace of a chunk of text.
+LAST_WHITESPACE = re.compile(r".*\s", re.DOTALL)
+
+# The minimum amount of bytes of a plain text file to read in each process when reading a single file in parallel.
+TEXT_BYTES_PER_WORKER = 64 * 1024 * 1024
+
+# The ASCII characters which are whitespace for str.split() and \s, and how to find them in bytes.
+ASCII_WHITESPACE = (b" ", b"\n", b"\t", b"\r", b"\v", b"\f", b"\x1c", b"\x1d", b"\x1e", b"\x1f")
+WHITESPACE_BYTE = re.compile(b"[" + re.escape(b"".join(ASCII_WHITESPACE)) + b"]")
+
+# REJECTED_SYMBOLS and WORD for ASCII text as bytes, where \w and \s only match ASCII characters.
+REJECTED_BYTES = re.compile(symbols_class(ACCEPT, negate=True, separators=SEPARATORS + r"\x1c-\x1f").encode() + b"+")
+WORD_BYTES = re.compile(WORD.pattern.encode())
+
+# Default accuracy of approximate collections, see WordsSketch.
+SKETCH_ERROR = 0.0001
+SKETCH_CONFIDENCE = 0.99
+SKETCH_PRECISION = 14
+SKETCH_HEAVY_HITTERS = 1000
+
+# Default memory for the counts of collections counted externally, and the estimated memory taken by each counted word
+# in it, see SpillingCounter. Runs on disk are merged into one once there are more than SPILL_MERGE_WIDTH of them.
+SPILL_BUDGET = 256 * 1024 * 1024
+SPILL_WORD_SIZE = 160
+SPILL_MERGE_WIDTH = 64
+# Every this many words of a run, its index remembers the word and where it is, to look words up without reading it all.
+SPILL_INDEX_STEP = 256
+
+# The characters str.splitlines() breaks lines at, and whitespace which is not one of them.
+LINE_BREAKS = "\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029"
+SPACE = re.compile(f"[^\\S{LINE_BREAKS}]")
+LAST_SPACE = re.compile(f".*[^\\S{LINE_BREAKS}]", re.DOTALL)
+
+
+def import_numpy():
+    """:return: the NumPy module, imported the first time it is needed, or None if it isn't installed."""
+    global NUMPY
+    if NUMPY is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        NUMPY = numpy
+
+    return NUMPY or None
+
+
+def select_frequency(counts: dict, top: int = 0, *, reverse: bool = False, minimum: int = 1, offset: int = 0,
+                     ties: bool = False) -> list:
+    """
+    Select the most or least frequent words without sorting the whole vocabulary or changing the counts.
+    Words with the same frequency keep the order in which they were first counted.
+    :param counts: the occurrences of each word.
+    :param top: the amount of words to return at most. 0 returns all words.
+    :param reverse: whether to select the least frequent words instead of the most frequent.
+    :param minimum: the minimum occurrences for a word to be selected.
+    :param offset: how many words to skip before the selection, to go through the list one page at a time.
+    :param ties: whether to also return the words with the same frequency as the last one, even beyond top.
+    :return: a list of ("word", occurrences) in descending order, or ascending if reversed.
+    """
+
+    # Whole lists are faster to sort in Python than to convert back from NumPy.
+    if top and len(counts) >= NUMPY_THRESHOLD and import_numpy() is not None:
+        return numpy_select_frequency(counts, top, reverse=reverse, minimum=minimum, offset=offset, ties=ties)
+
+    frequency = operator.itemgetter(1)
+    entries = counts.items()
+    if minimum > 1:
+        entries = [entry for entry in entries if entry[1] >= minimum]
+
+    if top:
+        # Partial selection through a heap costs O(V log k) instead of sorting all V words.
+        selection = (heapq.nsmallest if reverse else heapq.nlargest)(offset + top, entries, key=frequency)
+    else:
+        selection = sorted(entries, key=frequency, reverse=not reverse)
+
+    if ties and top and len(selection) == offset + top:
+        # Add the words tied with the last one which didn't make it into the selection, in their order.
+        last = selection[-1][1]
+        tied = sum(1 for entry in selection if entry[1] == last)
+        selection += [entry for entry in entries if entry[1] == last][tied:]
+
+    return selection[offset:]
+
+
+def numpy_select_frequency(counts: dict, top: int = 0, *, reverse: bool = False, minimum: int = 1, offset: int = 0,
+                           ties: bool = False) -> list:
+    """
+    Select the most or least frequent words with NumPy. The result is always the same as select_frequency's.
+    :param counts: the occurrences of each word.
+    :param top: the amount of words to return at most. 0 returns all words.
+    :param reverse: whether to select the least frequent words instead of the most frequent.
+    :param minimum: the minimum occurrences for a word to be selected.
+    :param offset: how many words to skip before the selection, to go through the list one page at a time.
+    :param ties: whether to also return the words with the same frequency as the last one, even beyond top.
+    :return: a list of ("word", occurrences) in descending order, or ascending if reversed.
+    """
+
+    numpy = import_numpy()
+    words = list(counts)
+    occurrences = numpy.fromiter(counts.values(), dtype=numpy.int64, count=len(words))
+
+    candidates = numpy.flatnonzero(occurrences >= minimum)  # Positions of the words to consider, in counting order.
+    keys = occurrences[candidates] if reverse else -occurrences[candidates]  # Sort keys, smallest first.
+
+    wanted = offset + top
+    if top and wanted < len(candidates):
+        # Find the key of the last selected word in linear time, then take all words before it and as many words tied
+        # with it as needed, in counting order.
+        threshold = numpy.partition(keys, wanted - 1)[wanted - 1]
+        before = numpy.flatnonzero(keys < threshold)
+        tied = numpy.flatnonzero(keys == threshold)
+        if not ties:
+            tied = tied[:wanted - len(before)]
+
+        chosen = numpy.sort(numpy.concatenate((before, tied)))
+    else:
+        chosen = numpy.arange(len(candidates))
+
+    # A stable sort keeps words with the same frequency in counting order.
+    selection = candidates[chosen[numpy.argsort(keys[chosen], kind="stable")]][offset:]
+
+    return list(zip(map(words.__getitem__, selection.tolist()), occurrences[selection].tolist()))
+
+
 class DecryptionError(Exception):
     """Catches the event in which an encrypted file is provided with a wrong password or none at all."""
     pass
 
 
+def open_pdf(pdf, password: str = ""):
+    """
+    Create a handler for a PDF file, decrypting it if needed.
+    :param pdf: the PDF file, opened in binary mode.
+    :param password: the password for the file, if needed.
+    :raise DecryptionError: if the file is encrypted and a wrong password or none was provided.
+    :raise NotImplementedError: if the file is encrypted with an unsupported algorythm.
+    :return: the PDF reader.
+    """
+
+    import PyPDF2  # Imported on the first PDF only, as it takes longer to import than the rest of the program.
+
+    reader = PyPDF2.PdfFileReader(pdf)  # Create a PDF handler.
+    if reader.isEncrypted and password:
+        # Try to open the file with the given password.
+        # Will raise NotImplementedError if the algorythm is not supported by PyPDF2.
+        if reader.decrypt(password) == 0:
+            raise DecryptionError
+    elif reader.isEncrypted and not password:
+        raise DecryptionError
+
+    return reader
+
+
+def extract_pdf_pages(reader, first: int, last: int) -> Iterator[str]:
+    """
+    Extract the text of a range of pages of a PDF, one page at a time.
+    :param reader: the PDF reader, see open_pdf.
+    :param first: the index of the first page to extract.
+    :param last: the index of the page after the last one to extract.
+    :return: a generator of the text of each page.
+    """
+
+    for page in range(first, last):
+        yield reader.getPage(page).extractText()
+
+
+def count_pdf_pages(file_path: str, password: str, first: int, last: int, keep_words: bool = False) -> tuple:
+    """
+    Count the words in a range of pages of a PDF, to read a single PDF in multiple processes.
+    The first and last word of the range may continue on the neighbouring pages, so they are returned as they are to
+    be joined with the text of the other ranges.
+    :param file_path: the file path and name.
+    :param password: the password for the file, if needed.
+    :param first: the index of the first page to count.
+    :param last: the index of the page after the last one to count.
+    :param keep_words: whether to also return the ordered list of words.
+    :return: a tuple of the raw text before the first whitespace, the counts and the list of words (None unless
+    keep_words) in between, and the raw text after the last whitespace. The last is None if there is no whitespace.
+    """
+
+    with open(file_path, "rb") as pdf:
+        text = "".join(extract_pdf_pages(open_pdf(pdf, password), first, last))
+
+    # Line breaks don't separate words in PDFs, so only other whitespace marks where the range can be cut.
+    first_space = SPACE.search(text)
+    if first_space is None:
+        return text, collections.Counter(), [] if keep_words else None, None
+
+    last_space = LAST_SPACE.match(text).end()
+    words = WordsFile.purify_joined_lines(text[first_space.start():last_space])
+
+    return text[:first_space.start()], collections.Counter(words), words if keep_words else None, text[last_space:]
+
+
+def count_text_range(file_path: str, first: int, last: int, keep_words: bool = False) -> tuple:
+    """
+    Count the words in a range of bytes of a UTF-8 file, to read a single file in multiple processes. The processes
+    share the same pages of the file through their mappings.
+    :param file_path: the file path and name.
+    :param first: the position of the first byte to count, just after a whitespace or at the start of the file.
+    :param last: the position after the last byte to count, just after a whitespace or at the end of the file.
+    :param keep_words: whether to also return the ordered list of words.
+    :return: a tuple of the counts and the list of words (None unless keep_words).
+    """
+
+    file = WordsFile.from_counts(file_path, collections.Counter(), array.array("I") if keep_words else None)
+    with open(file_path, "rb") as text, mmap.mmap(text.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+        file.store_range_words(mapping, first, last)
+
+    return file.file_counts, file.vocabulary.decode(file.file_tokens) if keep_words else None
+
+
+class XmlTextTarget:
+    """
+    Collect the text of an XML document as it is parsed, in document order and without building a tree.
+    Used as the target of an lxml parser.
+    """
+
+    def __init__(self, keep: Callable[[str], bool], separate: Callable[[str], bool], skip: Iterable[str] = ()):
+        """
+        Prepare to collect text.
+        :param keep: a function telling whether the text directly inside an element with the given tag is wanted.
+        :param separate: a function telling whether the start and end of an element with the given tag separate words.
+        :param skip: the tags of the elements whose whole contents are ignored.
+        """
+
+        self.keep = keep
+        self.separate = separate
+        self.skip = frozenset(skip)
+        self.open_tags = []  # The tags of the elements the parser is currently inside of.
+        self.skipped = 0  # How many of them are skipped elements or inside one.
+        self.pieces = []  # The text collected since the last time it was taken.
+
+    def start(self, tag: str, attributes: dict):
+        """Enter an element."""
+        del attributes
+        self.open_tags.append(tag)
+        if self.skipped or tag in self.skip:
+            self.skipped += 1
+        elif self.separate(tag):
+            self.pieces.append("\n")  # Blocks can start in the middle of a paragraph, e.g. footnotes.
+
+    def end(self, tag: str):
+        """Leave an element."""
+        self.open_tags.pop()
+        if self.skipped:
+            self.skipped -= 1
+        elif self.separate(tag):
+            self.pieces.append("\n")
+
+    def data(self, text: str):
+        """Collect text, both before the first child of an element and after each of its children."""
+        if self.open_tags and not self.skipped and self.keep(self.open_tags[-1]):
+            self.pieces.append(text)
+
+    def close(self):
+        """Finish parsing."""
+        pass
+
+    def take(self) -> str:
+        """:return: the text collected since the last call."""
+        text = "".join(self.pieces)
+        self.pieces.clear()
+
+        return text
+
+
+def extract_xml_text(xml, keep: Callable[[str], bool], separate: Callable[[str], bool],
+                     skip: Iterable[str] = ()) -> Iterator[str]:
+    """
+    Extract text from an XML document while reading it, so that memory use doesn't depend on the document's size.
+    :param xml: the XML document, opened in binary mode.
+    :param keep: a function telling whether the text directly inside an element with the given tag is wanted.
+    :param separate: a function telling whether the start and end of an element with the given tag separate words.
+    :param skip: the tags of the elements whose whole contents are ignored.
+    :return: a generator of consecutive chunks of text.
+    """
+
+    from lxml import etree  # Imported on the first document only, to start faster.
+
+    target = XmlTextTarget(keep, separate, skip)
+    parser = etree.XMLParser(target=target)
+
+    for block in iter(lambda: xml.read(CHUNK_SIZE), b""):
+        parser.feed(block)
+        yield target.take()
+
+    parser.close()
+    yield target.take()
+
+
+def extract_odt_text(file_path: str) -> Iterator[str]:
+    """
+    Extract the text of an ODT document one chunk at a time.
+    :param file_path: the file path and name.
+    :return: a generator of consecutive chunks of text.
+    """
+
+    with zipfile.ZipFile(file_path) as odt, odt.open("content.xml") as content:  # Open the file like a zip archive.
+        # Take the text of all text elements, and separate the words of different paragraphs, cells, etc.
+        yield from extract_xml_text(content, lambda tag: "text" in tag,
+                                    lambda tag: tag.rpartition("}")[2] not in ODT_INLINE)
+
+
+def extract_docx_text(file_path: str, parts: Iterable[str] = DOCX_PARTS) -> Iterator[str]:
+    """
+    Extract the text of a DOCX document one chunk at a time, straight from its XML.
+    :param file_path: the file path and name.
+    :param parts: patterns of the names of the parts to read after the main text, e.g. headers and footnotes.
+    :return: a generator of consecutive chunks of text.
+    """
+
+    with zipfile.ZipFile(file_path) as docx:  # Open the file like a zip archive.
+        names = ["word/document.xml"]
+        names += sorted(name for name in docx.namelist() if any(fnmatch.fnmatch(name, part) for part in parts))
+
+        for name in names:
+            with docx.open(name) as part:
+                # Take the text of all text runs, and separate the words of different paragraphs, cells, etc.
+                yield from extract_xml_text(part, lambda tag: tag.rpartition("}")[2] == "t",
+                                            lambda tag: tag.rpartition("}")[2] in DOCX_SEPARATORS, DOCX_SKIPPED)
+            yield "\n"
+
+
+class Vocabulary:
+    """
+    Give each word a number, so that sequences of words can be stored as compact arrays of numbers instead of lists of
+    strings. Each word is stored only once however many times it appears.
+    """
+
+    def __init__(self):
+        """Initialise an empty vocabulary."""
+        self.ids = {}  # Key: word. Value: number.
+        self.words = []  # The words, indexed by their number.
+
+    def __len__(self):
+        """Return how many words the vocabulary contains."""
+        return len(self.words)
+
+    def add(self, word: str) -> int:
+        """
+        Add a word to the vocabulary if it's not already present.
+        :param word: the word to add.
+        :return: the number of the word.
+        """
+
+        number = self.ids.get(word)
+        if number is None:
+            number = self.ids[word] = len(self.words)
+            self.words.append(word)
+
+        return number
+
+    def encode(self, words: list) -> array.array:
+        """
+        Turn words into their numbers, adding the new ones to the vocabulary.
+        :param words: the words to encode.
+        :return: an array of the numbers of the words, 4 bytes each.
+        """
+
+        # Add new words in order of appearance, then look all of them up at C speed.
+        for word in dict.fromkeys(words):
+            if word not in self.ids:
+                self.add(word)
+
+        return array.array("I", map(self.ids.__getitem__, words))
+
+    def decode(self, numbers: Iterable[int]) -> list:
+        """
+        Turn numbers back into words.
+        :param numbers: the numbers of the words.
+        :return: the list of the words.
+        """
+
+        return list(map(self.words.__getitem__, numbers))
+
+    def translate(self, numbers: array.array, words: list) -> array.array:
+        """
+        Turn the numbers of another vocabulary, e.g. from another process, into numbers of this one.
+        :param numbers: the numbers of the words in the other vocabulary.
+        :param words: the words of the other vocabulary, indexed by their number.
+        :return: an array of the numbers of the same words in this vocabulary.
+        """
+
+        translation = list(map(self.add, words))
+        return array.array("I", map(translation.__getitem__, numbers))
+
+
+# The vocabulary shared by all files, so that their sequences of numbers can be compared and joined.
+VOCABULARY = Vocabulary()
+
+
+class ExtractionCache:
+    """
+    Keep the counted words of each file on disk, so that files which didn't change don't need to be read again.
+    Files are recognised by their path, modification time and size, plus optionally a hash of their contents.
+    When the cache grows beyond its maximum size, the least recently used files are forgotten.
+    """
+
+    def __init__(self, directory: str = CACHE_DIRECTORY, max_size: int = CACHE_SIZE, content_hash: bool = False):
+        """
+        Open the cache, creating it if needed.
+        :param directory: the directory in which to store the cache.
+        :param max_size: the maximum amount of bytes of stored counts.
+        :param content_hash: whether to also compare the contents of files, for file systems with unreliable times.
+        """
+
+        self.directory = directory
+        self.max_size = max_size
+        self.content_hash = content_hash
+
+        os.makedirs(directory, exist_ok=True)
+        # The cache may be used by the threads of read_files_async, one at a time.
+        self.database = sqlite3.connect(os.path.join(directory, "cache.sqlite3"), check_same_thread=False)
+        self.lock = threading.Lock()
+        self.database.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, modified INTEGER, size INTEGER, hash TEXT, has_words INTEGER, data BLOB, used REAL)"
+        )
+        self.database.execute("CREATE INDEX IF NOT EXISTS files_used ON files (used)")
+        # The bytes of stored counts, kept up to date by put() so that the table is only scanned to make room.
+        self.size = self.database.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM files").fetchone()[0]
+
+    def __repr__(self):
+        """Represent the cache as its own name plus the directory it is stored in."""
+        return f"{self.__class__.__name__}: {self.directory}"
+
+    def __len__(self):
+        """Return how many files the cache contains."""
+        with self.lock:
+            return self.database.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    @staticmethod
+    def hash_file(file_path: str) -> str:
+        """:return: a hash of the contents of the file."""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as file:
+            for block in iter(lambda: file.read(CHUNK_SIZE), b""):
+                digest.update(block)
+
+        return digest.hexdigest()
+
+    def get(self, file_path: str, keep_words: bool = False) -> Optional[tuple]:
+        """
+        Look up a file in the cache.
+        :param file_path: the file path and name.
+        :param keep_words: whether the ordered list of words is needed too.
+        :return: a tuple of the word counts and the list of words (None unless keep_words), or None if the file is not
+        in the cache, has changed since or was stored without its list of words when it is needed.
+        """
+
+        file_path = os.path.abspath(file_path)
+        try:
+            status = os.stat(file_path)
+        except OSError:
+            return None
+
+        with self.lock:
+            entry = self.database.execute(
+                "SELECT hash, has_words, data FROM files WHERE path = ? AND modified = ? AND size = ?",
+                (file_path, status.st_mtime_ns, status.st_size)
+            ).fetchone()
+
+        if entry is None or (keep_words and not entry[1]):
+            return None
+        if self.content_hash and entry[0] != self.hash_file(file_path):
+            return None
+
+        with self.lock, self.database:
+            self.database.execute("UPDATE files SET used = ? WHERE path = ?", (time.time(), file_path))
+
+        data = json.loads(zlib.decompress(entry[2]))
+        return collections.Counter(dict(data["counts"])), data["words"] if keep_words else None
+
+    def put(self, file_path: str, counts: collections.Counter, words: Optional[list] = None):
+        """
+        Store a file in the cache, replacing any previous version, then make room if the cache is too big.
+        :param file_path: the file path and name.
+        :param counts: the occurrences of each word in the file.
+        :param words: the ordered list of words in the file, if it should be stored too.
+        """
+
+        file_path = os.path.abspath(file_path)
+        try:
+            status = os.stat(file_path)
+        except OSError:
+            return
+
+        # Keep the counts as a list to remember their order, which decides the order of words with the same frequency.
+        data = zlib.compress(json.dumps({"counts": list(counts.items()), "words": words}).encode("UTF-8"))
+        if len(data) > self.max_size:
+            return
+        content_hash = self.hash_file(file_path) if self.content_hash else None
+
+        with self.lock, self.database:
+            previous = self.database.execute("SELECT LENGTH(data) FROM files WHERE path = ?", (file_path,)).fetchone()
+            self.database.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (file_path, status.st_mtime_ns, status.st_size, content_hash, words is not None, data, time.time())
+            )
+            self.size += len(data) - (previous[0] if previous is not None else 0)
+            if self.size <= self.max_size:
+                return
+
+            # Forget the least recently used files until the cache fits its maximum size.
+            forgotten = []
+            for path, length in self.database.execute("SELECT path, LENGTH(data) FROM files ORDER BY used"):
+                if self.size <= self.max_size:
+                    break
+                forgotten.append((path,))
+                self.size -= length
+            self.database.executemany("DELETE FROM files WHERE path = ?", forgotten)
+
+    def clear(self):
+        """Forget all files in the cache."""
+        with self.lock:
+            with self.database:
+                self.database.execute("DELETE FROM files")
+            self.database.execute("VACUUM")
+            self.size = 0
+
+    def close(self):
+        """Close the cache's database."""
+        self.database.close()
+
+
+class Profiler:
+    """
+    Record where the time and memory go while reading files: in total for each stage of reading, and for each file.
+    The stages are:
+        extract: reading the file and extracting its text, e.g. with PyPDF2.
+        normalize: cutting the text into chunks at whitespace and lowercasing it (and joining the lines of PDFs).
+        tokenize: taking the words out of the text, see WordsFile.purify_words.
+        count: counting the words and storing them if they are kept.
+        merge: adding the counts of a file to those of a collection.
+    The time of each stage doesn't include the time of the other stages it waits for, e.g. counting waits for the
+    words to be extracted and tokenized. Only what happens in the current process is recorded, so files read by
+    other processes show up in the merge stage only.
+    When not started, the profiler costs one method call per chunk of text.
+    """
+
+    enabled = False
+    memory = False  # Whether peak memory is measured too, which makes reading files considerably slower.
+    idle = contextlib.nullcontext()  # What stage() returns when the profiler is stopped.
+
+    def __init__(self):
+        """Initialise a stopped profiler with no records."""
+        self.stages = {}  # Key: stage. Value: the seconds, calls, characters, words and peak memory of the stage.
+        self.files = {}  # Key: file path. Value: the seconds, bytes, words, peak memory and seconds of each stage.
+        self.active = []  # The stages currently running, innermost last, as [stage, running since, memory at start].
+        self.file_path = None  # The file currently being read.
+
+    def start(self, memory: bool = False):
+        """
+        Start recording.
+        :param memory: whether to measure peak memory too.
+        """
+
+        self.enabled = True
+        self.memory = memory
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stop(self):
+        """Stop recording, keeping the records."""
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+        self.enabled = False
+        self.memory = False
+
+    def clear(self):
+        """Forget all records."""
+        self.stages.clear()
+        self.files.clear()
+
+    def record(self, stage: str) -> dict:
+        """:return: the totals of a stage, creating them if needed."""
+        totals = self.stages.get(stage)
+        if totals is None:
+            totals = self.stages[stage] = {"seconds": 0.0, "calls": 0, "characters": 0, "words": 0, "peak_bytes": 0}
+
+        return totals
+
+    def spend(self, stage: str, seconds: float):
+        """Add time to a stage and to the stage of the current file."""
+        self.stages[stage]["seconds"] += seconds
+        if self.file_path is not None:
+            file_stages = self.files[self.file_path]["stages"]
+            file_stages[stage] = file_stages.get(stage, 0.0) + seconds
+
+    def switch(self) -> int:
+        """
+        Attribute the peak memory since the last switch to the innermost running stage and to the current file.
+        :return: the memory currently allocated.
+        """
+
+        current, peak = tracemalloc.get_traced_memory()
+        if self.active:
+            stage, _, start = self.active[-1]
+            self.stages[stage]["peak_bytes"] = max(self.stages[stage]["peak_bytes"], peak - start)
+        if self.file_path is not None:
+            record = self.files[self.file_path]
+            record["peak_bytes"] = max(record["peak_bytes"], peak - record["start_bytes"])
+        tracemalloc.reset_peak()
+
+        return current
+
+    def stage(self, stage: str, characters: int = 0):
+        """
+        Measure a stage, e.g. with profiler.stage("tokenize", len(text)): ...
+        :param stage: the name of the stage.
+        :param characters: the amount of text the stage works on.
+        :return: a context manager measuring what happens inside it.
+        """
+
+        if not self.enabled:
+            return self.idle
+
+        return self.measure(stage, characters)
+
+    @contextlib.contextmanager
+    def measure(self, stage: str, characters: int = 0):
+        """Measure a stage, see stage."""
+        totals = self.record(stage)
+        totals["calls"] += 1
+        totals["characters"] += characters
+
+        memory = self.switch() if self.memory else 0
+        now = time.perf_counter()
+        if self.active:
+            # Pause the outer stage.
+            self.spend(self.active[-1][0], now - self.active[-1][1])
+        self.active.append([stage, now, memory])
+
+        try:
+            yield
+        finally:
+            if self.memory:
+                self.switch()
+            now = time.perf_counter()
+            self.spend(stage, now - self.active.pop()[1])
+            if self.active:
+                self.active[-1][1] = now  # Resume the outer stage.
+
+    def iterate(self, stage: str, chunks: Iterable[str]) -> Iterable[str]:
+        """
+        Measure the production of each chunk of text, e.g. the reading of each page of a PDF.
+        :param stage: the name of the stage.
+        :param chunks: the chunks of text.
+        :return: the same chunks.
+        """
+
+        if not self.enabled:
+            return chunks
+
+        return self.measure_chunks(stage, iter(chunks))
+
+    def measure_chunks(self, stage: str, chunks: Iterator[str]) -> Iterator[str]:
+        """Measure the production of each chunk of text, see iterate."""
+        while True:
+            with self.measure(stage):
+                chunk = next(chunks, None)
+            if chunk is None:
+                return
+
+            self.stages[stage]["characters"] += len(chunk)
+            yield chunk
+
+    def count(self, stage: str, words: int):
+        """Record how many words a stage produced."""
+        if self.enabled:
+            self.record(stage)["words"] += words
+
+    @contextlib.contextmanager
+    def file(self, file_path: str):
+        """
+        Attribute the stages measured inside to a file, and measure the file's total time and peak memory.
+        :param file_path: the file path and name.
+        :return: a context manager measuring what happens inside it, which yields the record of the file (None if
+        the profiler is not started) to fill in its amount of words.
+        """
+
+        if not self.enabled:
+            yield None
+            return
+
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            size = 0
+
+        record = self.files[file_path] = {"seconds": 0.0, "bytes": size, "words": 0, "peak_bytes": 0,
+                                          "start_bytes": 0, "stages": {}}
+        if self.memory:
+            self.switch()
+            record["start_bytes"] = tracemalloc.get_traced_memory()[0]
+
+        outer, self.file_path = self.file_path, file_path
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            if self.memory:
+                self.switch()
+            self.file_path = outer
+
+    def report(self, top: int = 10) -> str:
+        """
+        Describe the records.
+        :param top: how many of the slowest files to describe.
+        :return: a table of the stages from the slowest, followed by a table of the slowest files.
+        """
+
+        megabyte = 1024 * 1024
+        total = sum(totals["seconds"] for totals in self.stages.values()) or 1
+        lines = [f"{'Stage':12}{'Seconds':>10}{'Share':>8}{'Calls':>10}{'Characters':>14}{'Words':>12}"
+                 + (f"{'Peak MB':>10}" if self.memory else "")]
+
+        for stage, totals in sorted(self.stages.items(), key=lambda item: item[1]["seconds"], reverse=True):
+            lines.append(f"{stage:12}{totals['seconds']:10.3f}{totals['seconds'] / total:8.0%}{totals['calls']:10}"
+                         f"{totals['characters']:14}{totals['words']:12}"
+                         + (f"{totals['peak_bytes'] / megabyte:10.2f}" if self.memory else ""))
+
+        if self.files:
+            lines.append("")
+            lines.append(f"{'Seconds':>10}{'MB':>10}{'Words':>12}" + (f"{'Peak MB':>10}" if self.memory else "")
+                         + f"  {'Slowest stage':16}File")
+
+            files = heapq.nlargest(top, self.files.items(), key=lambda item: item[1]["seconds"])
+            for file_path, record in files:
+                slowest = max(record["stages"].items(), key=operator.itemgetter(1), default=("", 0))[0]
+                lines.append(f"{record['seconds']:10.3f}{record['bytes'] / megabyte:10.2f}{record['words']:12}"
+                             + (f"{record['peak_bytes'] / megabyte:10.2f}" if self.memory else "")
+                             + f"  {slowest:16}{file_path}")
+
+        return "\n".join(lines)
+
+
+# The profiler used while reading files, stopped unless requested.
+PROFILER = Profiler()
+
+
 class WordsFile:
     """Manage the file and collect and enumerate the words it contains."""
-    file_words = []
-    file_unique_words = set()
+    file_counts = collections.Counter()  # Key: word. Value: occurrences in the file.
+    file_tokens = None  # The numbers of all words in order, only stored on request.
+    vocabulary = VOCABULARY  # The vocabulary the numbers of the words refer to.
     file_path = ""
 
     # Attributes to optimise performance in case of repeated calls.
     words_count = None
-    uniques_count = None
-    specific_count = {}
-    frequency_list = None
+    unique_words_count = None  # Only kept once the counts are dropped, see drop_counts.
 
     password = ""
 
-    def __init__(self, file_path: str, password: str):
+    # Options for reading large documents.
+    workers = 1
+    progress = None
+
+    def __init__(self, file_path: str, password: str, keep_words: bool = False,
+                 cache: Optional[ExtractionCache] = None, workers: int = 1,
+                 progress: Optional[Callable[[int, int], None]] = None, vocabulary: Optional[Vocabulary] = None):
         """
-        Initialise the file instance by storing a list of all words.
+        Initialise the file instance by counting all its words.
         :param file_path: the file path and name.
         :param password: the password provided for the file, if given.
+        :param keep_words: whether to also store the ordered list of all words, which can take a lot of memory.
+        :param cache: the cache in which to look for the file's words before reading it. Passworded files are never
+        cached, so that their contents are not stored unprotected.
+        :param workers: how many processes may read a large PDF at the same time. None uses one per processor.
+        :param progress: a function to call with the amount of pages read so far and the total pages of a PDF.
+        :param vocabulary: the vocabulary to number the words with, if not the shared one.
         """
 
         self.file_path = file_path
+        if vocabulary is not None:
+            self.vocabulary = vocabulary
         if password:
             self.password = password
+        self.workers = workers or os.cpu_count() or 1
+        self.progress = progress
+
+        with PROFILER.file(file_path) as record:
+            self.read(keep_words, cache)
+            if record is not None:
+                record["words"] = self.count_all_words()
+
+    def read(self, keep_words: bool = False, cache: Optional[ExtractionCache] = None):
+        """
+        Count all the words of the file, or take them from the cache.
+        :param keep_words: whether to also store the ordered list of all words.
+        :param cache: the cache in which to look for the file's words before reading it.
+        """
+
+        if cache is not None and not self.password:
+            cached = cache.get(self.file_path, keep_words)
+            if cached is not None:
+                self.file_counts, words = cached
+                if words is not None:
+                    self.file_tokens = self.vocabulary.encode(words)
+                return
+
+        self.file_counts = collections.Counter()
+        if keep_words:
+            self.file_tokens = array.array("I")
 
         self.store_all_words()
 
+        if cache is not None and not self.password:
+            cache.put(self.file_path, self.file_counts, self.get_words() if keep_words else None)
+
+    @classmethod
+    def from_counts(cls, file_path: str, counts: collections.Counter,
+                    tokens: Optional[array.array] = None) -> "WordsFile":
+        """
+        Create an instance from words which were already counted, e.g. by another process, without reading the file.
+        :param file_path: the file path and name.
+        :param counts: the occurrences of each word in the file.
+        :param tokens: the numbers of the words of the file in the shared vocabulary, if they were kept.
+        :return: the new instance.
+        """
+
+        file = cls.__new__(cls)
+        file.file_path = file_path
+        file.file_counts = counts
+        file.file_tokens = tokens
+
+        return file
+
     def __repr__(self):
         """Represent the class as its own name plus the path of the contained file."""
         return f"{self.__class__.__name__}: {self.file_path}"
@@ -71,7 +970,7 @@ class WordsFile:
         :return: False if the file contains no words, True otherwise.
         """
 
-        return len(self.file_words) > 0
+        return len(self.file_counts) > 0
 
     def __eq__(self, other):
         """Compare two instances on the base of the file path they point to."""
@@ -79,149 +978,1301 @@ class WordsFile:
 
     def store_all_words(self):
         """
-        Store an instance list with each word in the chosen file, eliminating every punctuation sign.
-        :raise DecryptionError: if a wrong password was provided.
-        :raise NotImplementedError: if the file is encrypted with an unsupported algorythm.
-        :raise ValueError: if the provided file is of an unsupported format.
+        Count each word in the chosen file, eliminating every punctuation sign.
+        :raise DecryptionError: if a wrong password was provided.
+        :raise NotImplementedError: if the file is encrypted with an unsupported algorythm.
+        :raise ValueError: if the provided file is of an unsupported format.
+        """
+
+        get_reader(self.file_path)(self)
+
+    def store_text_words(self):
+        """
+        Count the words of a plain text file. UTF-8 files are mapped in memory instead of being read, so that they are
+        never copied or decoded as a whole, and large ones are split at whitespace across multiple processes.
+        :raise UnicodeDecodeError: if the file is not in the expected encoding.
+        """
+
+        if os.path.isfile(self.file_path) and codecs.lookup(locale.getpreferredencoding(False)).name == "utf-8":
+            with open(self.file_path, "rb") as file:
+                size = os.fstat(file.fileno()).st_size
+                if size:  # Empty files can't be mapped, and have no words anyway.
+                    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+                        self.store_mapped_words(mapping, size)
+            return
+
+        # Plain text files can be huge: read them in chunks instead of all at once.
+        with codecs.open(self.file_path) as text:
+            self.store_words(self.stream_words(iter(lambda: text.read(CHUNK_SIZE), "")))
+
+    def store_mapped_words(self, mapping: mmap.mmap, size: int):
+        """
+        Count the words of a UTF-8 file mapped in memory, splitting large files across multiple processes.
+        :param mapping: the mapped file.
+        :param size: the size of the file in bytes.
+        """
+
+        ranges = min(self.workers, size // TEXT_BYTES_PER_WORKER)
+        if ranges <= 1:
+            self.store_range_words(mapping, 0, size)
+            return
+
+        # Give each process a range of bytes ending after a whitespace, so that no word is cut in two.
+        bounds = [0]
+        for index in range(1, ranges):
+            whitespace = WHITESPACE_BYTE.search(mapping, max(bounds[-1], size * index // ranges))
+            bounds.append(whitespace.end() if whitespace else size)
+        bounds.append(size)
+
+        with concurrent.futures.ProcessPoolExecutor(ranges) as executor:
+            results = [executor.submit(count_text_range, self.file_path, first, last, self.file_tokens is not None)
+                       for first, last in zip(bounds, bounds[1:]) if first < last]
+
+            for result in results:
+                counts, words = result.result()
+                if words is not None:
+                    self.store_words(words)
+                else:
+                    self.file_counts.update(counts)
+                    self.words_count = None
+
+    def store_range_words(self, mapping: mmap.mmap, first: int, last: int):
+        """
+        Count the words of a range of a UTF-8 file mapped in memory, one chunk at a time. Chunks of pure ASCII are
+        tokenized as bytes and only their words are decoded, other chunks are decoded and tokenized as text.
+        :param mapping: the mapped file.
+        :param first: the position of the first byte of the range, just after a whitespace or at the start of the file.
+        :param last: the position after the last byte of the range, just after a whitespace or at the end of the file.
+        """
+
+        position = first
+
+        while position < last:
+            end = min(position + CHUNK_SIZE, last)
+            if end < last:
+                # End the chunk after its last whitespace, as the word may continue in the next chunk. A character
+                # can't be cut in two either, since the bytes of UTF-8 characters beyond ASCII are never ASCII.
+                cut = max(mapping.rfind(whitespace, position, end) for whitespace in ASCII_WHITESPACE)
+                if cut < 0:
+                    following = WHITESPACE_BYTE.search(mapping, end, last)
+                    end = following.end() if following else last
+                else:
+                    end = cut + 1
+
+            with PROFILER.stage("extract", end - position):
+                chunk = mapping[position:end]
+            position = end
+
+            if not chunk.isascii():
+                self.store_words(self.stream_words([chunk.decode("UTF-8")]))
+                continue
+
+            if self.file_tokens is not None:
+                with PROFILER.stage("normalize", len(chunk)):
+                    chunk = chunk.lower()
+                with PROFILER.stage("tokenize", len(chunk)):
+                    words = list(map(bytes.decode, WORD_BYTES.findall(REJECTED_BYTES.sub(b"", chunk))))
+                PROFILER.count("tokenize", len(words))
+                self.store_words(words)
+                continue
+
+            with PROFILER.stage("tokenize", len(chunk)):
+                words = WORD_BYTES.findall(REJECTED_BYTES.sub(b"", chunk))
+            PROFILER.count("tokenize", len(words))
+
+            with PROFILER.stage("count"):
+                # Count the words as they are, then lowercase and decode each different word only once. The first
+                # form of each word to appear decides its place in the counts, as if it had been lowercased first.
+                for word, occurrences in collections.Counter(words).items():
+                    self.file_counts[word.lower().decode()] += occurrences
+            self.words_count = None
+
+    def store_pdf_words(self):
+        """
+        Count the words of a PDF one page at a time, splitting the pages of large PDFs across multiple processes.
+        :raise DecryptionError: if a wrong password was provided.
+        :raise NotImplementedError: if the file is encrypted with an unsupported algorythm.
+        """
+
+        with open(self.file_path, "rb") as pdf:
+            reader = open_pdf(pdf, self.password)
+            total = reader.numPages
+            ranges = min(self.workers, total // PDF_PAGES_PER_WORKER)
+
+            if ranges <= 1:
+                pages = extract_pdf_pages(reader, 0, total)
+                if self.progress is not None:
+                    pages = self.report_progress(pages, total)
+
+                self.store_words(self.stream_words(pages, join_lines=True))
+                return
+
+        # Give each process a range of consecutive pages.
+        bounds = [total * index // ranges for index in range(ranges + 1)]
+        with concurrent.futures.ProcessPoolExecutor(ranges) as executor:
+            results = [executor.submit(count_pdf_pages, self.file_path, self.password, first, last,
+                                       self.file_tokens is not None) for first, last in zip(bounds, bounds[1:])]
+
+            # Join the words cut by the edges of the ranges, as if the pages had been read one after the other.
+            remainder = ""
+            for result, last in zip(results, bounds[1:]):
+                start, counts, words, end = result.result()
+                if self.progress is not None:
+                    self.progress(last, total)
+
+                if end is None:
+                    remainder += start
+                    continue
+
+                self.store_words(self.purify_joined_lines(remainder + start))
+                if words is not None:
+                    self.store_words(words)
+                else:
+                    self.file_counts.update(counts)
+                    self.words_count = None
+                remainder = end
+
+            self.store_words(self.purify_joined_lines(remainder))
+
+    def report_progress(self, pages: Iterable[str], total: int) -> Iterator[str]:
+        """
+        Report each page as it is read.
+        :param pages: the text of each page.
+        :param total: the total amount of pages.
+        :return: a generator of the text of each page.
+        """
+
+        for number, page in enumerate(pages, 1):
+            yield page
+            self.progress(number, total)
+
+    def store_words(self, words: Iterable[str]):
+        """
+        Add words to the file's counts, and to its list of words if it is kept.
+        :param words: the purified words, in the order they appear in the file.
+        """
+
+        with PROFILER.stage("count"):
+            if self.file_tokens is not None:
+                words = list(words)
+                self.file_tokens += self.vocabulary.encode(words)
+
+            self.file_counts.update(words)
+
+        # Invalidate the cached values.
+        self.words_count = None
+
+    @classmethod
+    def purify_joined_lines(cls, contents: str) -> list:
+        """
+        Purify text whose line breaks don't separate words, like the text extracted from PDFs.
+        :param contents: the raw text.
+        :return: a list of purified words.
+        """
+
+        with PROFILER.stage("normalize", len(contents)):
+            text = cls.normalize_joined_lines(contents)
+
+        return cls.tokenize(text)
+
+    @staticmethod
+    def normalize_joined_lines(contents: str) -> str:
+        """
+        Lowercase text whose line breaks don't separate words and remove its line breaks.
+        :param contents: the raw text.
+        :return: the lowercased text without line breaks.
+        """
+
+        # Eliminate the fake line breaks PDFs have, after lowercasing so that lower() still sees them as breaks.
+        # Real line breaks in PDFs automatically get some whitespace, so we don't need to join words using it.
+        return "".join(contents.lower().splitlines())
+
+    @classmethod
+    def tokenize(cls, contents: str) -> list:
+        """
+        Purify words from lowercased text, recording the work if the profiler is started.
+        :param contents: the lowercased text.
+        :return: a list of purified words.
+        """
+
+        with PROFILER.stage("tokenize", len(contents)):
+            words = cls.purify_words(contents)
+        PROFILER.count("tokenize", len(words))
+
+        return words
+
+    @classmethod
+    def stream_words(cls, chunks: Iterable[str], join_lines: bool = False) -> Iterator[str]:
+        """
+        Purify words from consecutive chunks of raw text, holding only one chunk at a time in memory.
+        Words cut in two by a chunk boundary are put back together before being purified.
+        :param chunks: the consecutive chunks of text, e.g. successive reads from a file.
+        :param join_lines: whether line breaks don't separate words, see purify_joined_lines.
+        :return: a generator of purified words, the same as purifying the whole text at once would return.
+        """
+
+        normalize = cls.normalize_joined_lines if join_lines else str.lower
+        last_separator = LAST_SPACE if join_lines else LAST_WHITESPACE
+        pending = []  # The text after the last whitespace, one piece per chunk, joined once whitespace turns up.
+
+        for chunk in PROFILER.iterate("extract", chunks):
+            with PROFILER.stage("normalize", len(chunk)):
+                # Keep back whatever follows the last whitespace, as the word may continue in the next chunk.
+                # Cutting at whitespace also ensures lower() sees the same context as it would on the whole text.
+                # Only the new chunk is searched, so that text without whitespace is still scanned only once.
+                complete = last_separator.match(chunk)
+                if complete is None:
+                    pending.append(chunk)
+                    continue
+
+                pending.append(chunk[:complete.end()])
+                text = normalize("".join(pending))
+                pending = [chunk[complete.end():]]
+
+            yield from cls.tokenize(text)
+
+        remainder = "".join(pending)
+        if remainder:
+            with PROFILER.stage("normalize", len(remainder)):
+                text = normalize(remainder)
+
+            yield from cls.tokenize(text)
+
+    @staticmethod
+    def purify_words(contents: str) -> list:
+        """
+        Clean up words by removing empty words, whitespace and symbols.
+        :param contents: the string to purify.
+        :return: a list of purified words.
+        """
+
+        # Drop the symbols we don't accept, then take every word trimmed of the symbols to remove at its start/end.
+        return WORD.findall(REJECTED_SYMBOLS.sub("", contents))
+
+    def get_words(self) -> Optional[list]:
+        """
+        Get the list of the file's words. Unless the file was created with keep_words, the list is rebuilt from the
+        counts and equal words are grouped together instead of appearing in their original order.
+        :return: the list of words or None.
+        """
+
+        if not self.file_counts:
+            return None
+
+        if self.file_tokens is not None:
+            return self.vocabulary.decode(self.file_tokens)
+
+        return list(self.file_counts.elements())
+
+    def get_tokens(self) -> Optional[array.array]:
+        """:return: the numbers of the file's words in order, if the file was created with keep_words, or None."""
+        return self.file_tokens
+
+    def get_unique_words(self) -> Optional[set]:
+        """:return: a set of the unique words in the chosen file or None if no words are present."""
+        if self.file_counts:
+            return set(self.file_counts)
+
+        return None
+
+    def count_all_words(self) -> int:
+        """:return: the count of all words in the chosen file."""
+        if self.words_count is None:
+            self.words_count = sum(self.file_counts.values())
+
+        return self.words_count
+
+    def count_unique_words(self) -> int:
+        """:return: the count of all unique words in the chosen file."""
+        if self.unique_words_count is not None:
+            return self.unique_words_count
+
+        return len(self.file_counts)
+
+    def drop_counts(self):
+        """
+        Forget the words of the file to save memory, e.g. once they were added to an approximate collection.
+        Only the amounts of words and unique words are kept.
+        """
+
+        self.count_all_words()
+        self.unique_words_count = len(self.file_counts)
+        self.file_counts = collections.Counter()
+        self.file_tokens = None
+
+    def count_word(self, word: str) -> int:
+        """:return: the count of the occurrences of the specified word in the chosen file."""
+        return self.file_counts[word]
+
+    def get_frequency(self, top: int = 0, reverse: bool = False, **options) -> list:
+        """
+        Get the frequency list of the words in the file.
+        :param top: the amount of words to return at most. Defaults to 0, the whole list.
+        :param reverse: whether the frequency list should show the least common items. Defaults to False.
+        :param options: further options for the selection (minimum, offset, ties), see select_frequency.
+        :return: a list of ("word", occurrences) in descending order, or ascending if reversed.
+        """
+
+        return select_frequency(self.file_counts, top, reverse=reverse, **options)
+
+
+def register_reader(extension: str, reader):
+    """
+    Accept a new file format, or replace the reader of an existing one.
+        Example for a reader in a separate module, imported the first time a Markdown file is read:
+            uniqword.register_reader(".md", "mypackage.markdown:read_markdown")
+    :param extension: the extension of the files of the format, including the dot, e.g. ".md".
+    :param reader: a function taking the WordsFile to fill and storing the words of its file, usually with
+    file.store_words(file.stream_words(chunks)) where chunks are consecutive pieces of the file's text. It can also be
+    given as "module:function", to import its module only the first time a file of the format is read. Files read by
+    worker processes are read with the readers registered in those processes, so register readers when your module
+    is imported.
+    """
+
+    READERS[extension] = reader
+
+
+def get_reader(file_path: str):
+    """
+    Find the reader for a file, importing it if this is the first file of its format.
+    :param file_path: the file path and name.
+    :raise ValueError: if the file is of an unsupported format.
+    :return: the reader function, see register_reader.
+    """
+
+    # Prefer the longest matching extension, e.g. ".tar.gz" over ".gz".
+    extension = max((extension for extension in READERS if file_path.endswith(extension)), key=len, default=None)
+    if extension is None:
+        raise ValueError(f"unsupported format: {os.path.basename(file_path)}")
+    reader = READERS[extension]
+
+    if isinstance(reader, str):
+        module, _, name = reader.partition(":")
+        reader = READERS[extension] = getattr(importlib.import_module(module), name)
+
+    return reader
+
+
+def read_docx(file: WordsFile):
+    """Store the words of a DOCX document."""
+    file.store_words(file.stream_words(extract_docx_text(file.file_path)))
+
+
+def read_odt(file: WordsFile):
+    """Store the words of an ODT document."""
+    file.store_words(file.stream_words(extract_odt_text(file.file_path)))
+
+
+register_reader(".txt", WordsFile.store_text_words)
+register_reader(".docx", read_docx)
+register_reader(".odt", read_odt)
+register_reader(".pdf", WordsFile.store_pdf_words)
+
+
+def discover_files(directory: str, *, include: Iterable[str] = (), exclude: Iterable[str] = (),
+                   max_depth: Optional[int] = None, follow_symlinks: bool = False, min_size: int = 0,
+                   max_size: Optional[int] = None) -> Iterator[str]:
+    """
+    Find all files of a supported format in a directory and its subdirectories, one at a time, so that they can be
+    processed while the search goes on. Files and directories beginning in . are ignored, as are subdirectories which
+    can't be read. Entries are sorted by name to always provide the same files in the same order.
+    Patterns are matched against both the name of an entry and its path relative to the directory, using / as separator.
+    :param directory: the path of the directory to search.
+    :param include: glob patterns files must match, e.g. "*.pdf" or "reports/*". Empty accepts all files.
+    :param exclude: glob patterns of files and directories to skip.
+    :param max_depth: how many levels of subdirectories to search. 0 searches only the directory itself, None all.
+    :param follow_symlinks: whether to follow symbolic links to directories or to ignore them. Links to files are
+    always followed, and broken links ignored.
+    :param min_size: the minimum size in bytes of the files to provide.
+    :param max_size: the maximum size in bytes of the files to provide, if any.
+    :raise FileNotFoundError: if the directory doesn't exist.
+    :raise NotADirectoryError: if the path is not a directory.
+    :return: a generator of the paths of the files found.
+    """
+
+    include = tuple(include)
+    exclude = tuple(exclude)
+    formats = tuple(READERS)
+
+    def matches(name: str, relative_path: str, patterns: tuple) -> bool:
+        """:return: whether the name or relative path of an entry matches any of the patterns."""
+        return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relative_path, pattern) for pattern in patterns)
+
+    visited = set()  # Identifiers of the directories already searched, to avoid going in circles through symlinks.
+    pending = [(directory, "", 0)]  # Directories left to search, with their relative path and depth.
+
+    while pending:
+        path, relative_directory, depth = pending.pop()
+
+        try:
+            if follow_symlinks:
+                identifier = os.stat(path)
+                if (identifier.st_dev, identifier.st_ino) in visited:
+                    continue
+                visited.add((identifier.st_dev, identifier.st_ino))
+
+            with os.scandir(path) as scan:
+                entries = sorted(scan, key=lambda entry: entry.name)
+        except OSError:
+            if path == directory:
+                raise  # Only report problems with the directory which was asked for.
+            continue
+
+        subdirectories = []
+
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+
+            relative_path = relative_directory + entry.name
+            if matches(entry.name, relative_path, exclude):
+                continue
+
+            try:
+                if entry.is_dir():
+                    if entry.is_symlink() and not follow_symlinks:
+                        continue
+                    if max_depth is None or depth < max_depth:
+                        subdirectories.append((entry.path, relative_path + "/", depth + 1))
+                    continue
+
+                if not entry.name.endswith(formats) or not entry.is_file():
+                    continue
+                if include and not matches(entry.name, relative_path, include):
+                    continue
+
+                if min_size or max_size is not None:
+                    size = entry.stat().st_size
+                    if size < min_size or (max_size is not None and size > max_size):
+                        continue
+            except OSError:
+                continue  # Ignore broken links and entries which disappeared in the meantime.
+
+            yield os.path.normpath(entry.path)
+
+        # Search subdirectories after the files, in name order.
+        pending += reversed(subdirectories)
+
+
+def count_file(file_path: str, password: str = "", keep_words: bool = False) -> tuple:
+    """
+    Read a file and return only its counted words, compact enough to be sent back from a worker process.
+    :param file_path: the file path and name.
+    :param password: the password for the file, if needed.
+    :param keep_words: whether to also return the ordered words.
+    :return: a tuple of the word counts, the numbers of the words in order and the words of their vocabulary, indexed
+    by their number. The last two are None unless keep_words.
+    """
+
+    # Number the words separately, since the shared vocabulary of this process is not the one of the main process.
+    vocabulary = Vocabulary()
+    file = WordsFile(file_path, password, keep_words, vocabulary=vocabulary)
+
+    if keep_words:
+        return file.file_counts, file.file_tokens, vocabulary.words
+
+    return file.file_counts, None, None
+
+
+def read_files(file_paths: Iterable[str], *, workers: int = WORKERS, threads: bool = False,
+               keep_words: bool = False, cache: Optional[ExtractionCache] = None,
+               errors: Optional[Callable[[str, Exception], None]] = None) -> Iterator[WordsFile]:
+    """
+    Read the provided files, in parallel if more than one worker is requested. Files are always provided in the same
+    order as their paths, regardless of which finishes reading first. Passworded files are ignored unless errors is
+    given.
+    :param file_paths: the paths of the files to read. They are consumed lazily, so this may be a generator.
+    :param workers: how many files to read at the same time. None uses one worker per processor.
+    :param threads: whether to use threads instead of processes. Threads are cheaper to start but only help when
+    reading the files is slower than processing them (e.g. plain text on a network drive).
+    :param keep_words: whether to also store the ordered list of words of each file.
+    :param cache: the cache to look for files in before reading them, and to store them in afterwards.
+    :param errors: a function to call with the path and the error of each file which couldn't be read, including
+    passworded files, before moving on to the next file. Without it, the first error is raised.
+    :return: a generator of the files read successfully.
+    """
+
+    if workers == 1:
+        for file_path in file_paths:
+            try:
+                file = WordsFile(file_path, "", keep_words, cache)
+            except Exception as error:
+                report_error(file_path, error, errors)
+                continue
+            yield file
+        return
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    def lookup(file_path: str):
+        """:return: the counts and words of the file found in the cache, or the pending result of reading it."""
+        cached = cache.get(file_path, keep_words) if cache is not None else None
+        return executor.submit(count_file, file_path, "", keep_words) if cached is None else cached
+
+    executor_class = concurrent.futures.ThreadPoolExecutor if threads else concurrent.futures.ProcessPoolExecutor
+    # Cache lookups can hash whole files, so they run in threads of their own instead of one by one before reading.
+    with executor_class(workers) as executor, concurrent.futures.ThreadPoolExecutor(workers) as lookups:
+        # Only keep a few files per worker in flight, so that the paths and results don't pile up in memory.
+        in_flight = 4 * workers
+        pending = collections.deque()
+
+        for file_path in file_paths:
+            # Files found in the cache wait in line with the others to keep the order.
+            pending.append((file_path, lookups.submit(lookup, file_path)))
+
+            if len(pending) >= in_flight:
+                file_path, looked_up = pending.popleft()
+                yield from collect_file(file_path, looked_up.result(), cache, errors)
+
+        while pending:
+            file_path, looked_up = pending.popleft()
+            yield from collect_file(file_path, looked_up.result(), cache, errors)
+
+
+def collect_file(file_path: str, result, cache: Optional[ExtractionCache] = None,
+                 errors: Optional[Callable[[str, Exception], None]] = None) -> Iterator[WordsFile]:
+    """
+    Wait for a file read by read_files to be ready.
+    :param file_path: the file path and name.
+    :param result: the pending result of count_file for the file, or the counts and words found in the cache.
+    :param cache: the cache to store the file in once it has been read.
+    :param errors: the function to report the file to if it couldn't be read, see read_files.
+    :return: a generator of the file, or of nothing if it couldn't be read.
+    """
+
+    if isinstance(result, tuple):
+        counts, words = result
+        yield WordsFile.from_counts(file_path, counts, VOCABULARY.encode(words) if words is not None else None)
+        return
+
+    try:
+        counts, tokens, words = result.result()
+    except Exception as error:
+        report_error(file_path, error, errors)
+        return
+
+    if cache is not None:
+        store_file(cache, file_path, (counts, tokens, words))
+
+    yield WordsFile.from_counts(file_path, counts, VOCABULARY.translate(tokens, words) if tokens is not None else None)
+
+
+def store_file(cache: ExtractionCache, file_path: str, result: tuple):
+    """
+    Store a file counted by count_file in the cache.
+    :param cache: the cache to store the file in.
+    :param file_path: the file path and name.
+    :param result: the result of count_file for the file.
+    """
+
+    counts, tokens, words = result
+    cache.put(file_path, counts, [words[token] for token in tokens] if tokens is not None else None)
+
+
+def report_error(file_path: str, error: Exception, errors: Optional[Callable[[str, Exception], None]] = None):
+    """
+    Deal with a file which couldn't be read, see read_files.
+    :param file_path: the file path and name.
+    :param error: the error raised while reading the file.
+    :param errors: the function to report the file to, if any.
+    :raise Exception: the error, unless it can be reported or the file was only passworded.
+    """
+
+    if errors is not None:
+        errors(file_path, error)
+    elif not isinstance(error, DecryptionError):
+        raise error
+    # Otherwise suppress cases where passworded files are found, ignore them and move on.
+
+
+def prefetch_file(file_path: str):
+    """
+    Read a file without keeping its contents, so that the system has it in memory by the time it is counted.
+    Only the first READAHEAD_SIZE bytes are read: the system reads ahead of the rest while it is counted.
+    :param file_path: the file path and name.
+    """
+
+    buffer = bytearray(CHUNK_SIZE)
+    try:
+        with open(file_path, "rb") as file:
+            for _ in range(0, READAHEAD_SIZE, CHUNK_SIZE):
+                if not file.readinto(buffer):
+                    break
+    except OSError:
+        pass  # Counting the file reports the problem.
+
+
+async def read_files_async(file_paths: Iterable[str], *, workers: int = WORKERS, threads: bool = False,
+                           readahead: int = READAHEAD, queue_size: Optional[int] = None, keep_words: bool = False,
+                           cache: Optional[ExtractionCache] = None,
+                           errors: Optional[Callable[[str, Exception], None]] = None) -> AsyncIterator[WordsFile]:
+    """
+    Read the provided files through a pipeline of stages working at the same time, so that the disk doesn't wait for
+    the processors and the other way around. The stages are:
+        discover: going through the paths in a thread, since they are often found on disk by discover_files.
+        read: looking files up in the cache, or reading them ahead in `readahead` threads, see prefetch_file.
+        count: extracting and counting the words of files in `workers` processes (or threads), see count_file.
+        merge: providing the counted files in order, e.g. to add them to a collection.
+    The stages pass files through queues of at most queue_size files, and at most queue_size files are in the pipeline
+    at any time, so that a slow stage holds back the others instead of letting files pile up in memory.
+    Files are always provided in the same order as their paths, like read_files. Passworded files are ignored unless
+    errors is given.
+        Example:
+            async for file in uniqword.read_files_async(uniqword.discover_files("mydir"), workers=4):
+                collection.add_files(file)
+    :param file_paths: the paths of the files to read. They are consumed lazily, so this may be a generator.
+    :param workers: how many files to count at the same time. None uses one worker per processor.
+    :param threads: whether to count files with threads instead of processes, see read_files.
+    :param readahead: how many files to read ahead at the same time.
+    :param queue_size: how many files may be in the pipeline at most. Defaults to four per worker and reader.
+    :param keep_words: whether to also store the ordered list of words of each file.
+    :param cache: the cache to look for files in before reading them, and to store them in afterwards.
+    :param errors: a function to call with the path and the error of each file which couldn't be read, see read_files.
+    :raise OSError: and the other errors of reading files, when the turn of the file comes, unless errors is given.
+    Errors of going through the paths themselves, e.g. a missing directory, are always raised.
+    :return: an asynchronous generator of the files read successfully.
+    """
+
+    import asyncio  # Imported only when files are read ahead, to start faster.
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    readahead = max(readahead, 1)
+    if queue_size is None:
+        queue_size = 4 * (workers + readahead)
+
+    loop = asyncio.get_running_loop()
+    found = asyncio.Queue(queue_size)  # Files to read: (number, path), then None once there are no more.
+    fetched = asyncio.Queue(queue_size)  # Files to count: (number, path, cached counts or None), then None.
+    counted = asyncio.Queue()  # Files to provide: (number, path, result), then (amount of files, None, None).
+    slots = asyncio.Semaphore(queue_size)  # Taken when a file is found, given back once it is provided.
+
+    async def discover():
+        """Find the files, stopping whenever the pipeline is full."""
+        paths = iter(file_paths)
+        number = 0
+        try:
+            while True:
+                await slots.acquire()
+                file_path = await asyncio.to_thread(next, paths, None)
+                if file_path is None:
+                    slots.release()
+                    break
+                await found.put((number, file_path))
+                number += 1
+        except Exception as error:
+            # Report the error as the result of one more file, so that it is raised after the files found before.
+            failure = loop.create_future()
+            failure.set_exception(error)
+            await counted.put((number, "", failure))
+            number += 1
+
+        for _ in range(readahead):
+            await found.put(None)
+        await counted.put((number, None, None))
+
+    async def read():
+        """Read ahead the files which are not in the cache."""
+        while True:
+            item = await found.get()
+            if item is None:
+                return
+
+            number, file_path = item
+            # The cache may hash whole files, so it is used from the readers' threads like reading ahead.
+            cached = None
+            if cache is not None:
+                cached = await loop.run_in_executor(readers, cache.get, file_path, keep_words)
+            if cached is None:
+                await loop.run_in_executor(readers, prefetch_file, file_path)
+            await fetched.put((number, file_path, cached))
+
+    async def stop_counting(reading: list):
+        """Tell the counting stage when all the files were read."""
+        await asyncio.gather(*reading)
+        for _ in range(workers):
+            await fetched.put(None)
+
+    async def count():
+        """Count the words of the files which are not in the cache."""
+        while True:
+            item = await fetched.get()
+            if item is None:
+                return
+
+            number, file_path, cached = item
+            if cached is None:
+                result = loop.run_in_executor(counters, count_file, file_path, "", keep_words)
+                await asyncio.wait([result])  # Errors are raised by collect_file, in order.
+                if cache is not None and result.exception() is None:
+                    await loop.run_in_executor(readers, store_file, cache, file_path, result.result())
+            else:
+                result = cached
+            await counted.put((number, file_path, result))
+
+    executor_class = concurrent.futures.ThreadPoolExecutor if threads else concurrent.futures.ProcessPoolExecutor
+    readers = concurrent.futures.ThreadPoolExecutor(readahead)
+    counters = executor_class(workers)
+
+    reading = [loop.create_task(read()) for _ in range(readahead)]
+    tasks = [loop.create_task(discover()), loop.create_task(stop_counting(reading)), *reading,
+             *[loop.create_task(count()) for _ in range(workers)]]
+
+    try:
+        waiting = {}  # Key: number of a file counted before the ones preceding it. Value: (path, result).
+        number = 0
+        total = None
+        while total is None or number < total:
+            if number not in waiting:
+                counted_number, file_path, result = await counted.get()
+                if file_path is None:
+                    total = counted_number
+                else:
+                    waiting[counted_number] = (file_path, result)
+                continue
+
+            file_path, result = waiting.pop(number)
+            if not file_path:
+                result.result()  # Raise the error of going through the paths.
+            for file in collect_file(file_path, result, errors=errors):  # Counted files were already cached.
+                yield file
+            number += 1
+            slots.release()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        readers.shutdown(cancel_futures=True)
+        counters.shutdown(cancel_futures=True)
+
+
+class SortedVocabulary:
+    """
+    Find the words starting or ending with some letters, or matching a wildcard pattern, without going through all
+    the words: they are kept sorted, and sorted by their reversed spelling for suffixes.
+    """
+
+    def __init__(self, words: Iterable[str]):
+        """
+        Sort the words.
+        :param words: the different words to find.
+        """
+
+        self.words = sorted(words)
+        self.reversed_words = None  # The reversed words, sorted. Only built for the first suffix search.
+
+    def __len__(self):
+        """Return how many words the vocabulary contains."""
+        return len(self.words)
+
+    @staticmethod
+    def find_range(words: list, prefix: str) -> list:
+        """:return: the words of a sorted list starting with the prefix."""
+        if not prefix:
+            return words
+
+        # The first string after all those starting with the prefix.
+        following = prefix[:-1] + chr(ord(prefix[-1]) + 1) if ord(prefix[-1]) < sys.maxunicode else None
+        first = bisect.bisect_left(words, prefix)
+        last = bisect.bisect_left(words, following, first) if following is not None else len(words)
+
+        return words[first:last]
+
+    def find_prefixed(self, prefix: str) -> list:
+        """:return: the sorted words starting with the prefix."""
+        return self.find_range(self.words, prefix)
+
+    def find_suffixed(self, suffix: str) -> list:
+        """:return: the words ending with the suffix, sorted by their reversed spelling."""
+        if self.reversed_words is None:
+            self.reversed_words = sorted(word[::-1] for word in self.words)
+
+        return [word[::-1] for word in self.find_range(self.reversed_words, suffix[::-1])]
+
+    def find_matching(self, pattern: str) -> list:
+        """
+        Find the words matching a wildcard pattern, as understood by fnmatch: * matches any letters, ? a single
+        letter and [abc] one of the letters inside. Only the words starting with the letters before the first wildcard,
+        or if there are none ending with the letters after the last wildcard, are checked.
+        :param pattern: the pattern.
+        :return: the matching words.
+        """
+
+        wildcard = re.search(r"[*?[]", pattern)
+        if wildcard is None:
+            position = bisect.bisect_left(self.words, pattern)
+            return [pattern] if position < len(self.words) and self.words[position] == pattern else []
+
+        if wildcard.start():
+            candidates = self.find_prefixed(pattern[:wildcard.start()])
+        else:
+            suffix = pattern[max(pattern.rfind(symbol) for symbol in "*?]") + 1:]
+            candidates = self.find_suffixed(suffix) if suffix else self.words
+
+        matches = re.compile(fnmatch.translate(pattern)).match
+        return [word for word in candidates if matches(word)]
+
+
+def hash_word(word: str) -> int:
+    """:return: a 64-bit hash of the word, the same in every process and every run."""
+    return int.from_bytes(hashlib.blake2b(word.encode("UTF-8"), digest_size=8).digest(), "little")
+
+
+class HyperLogLog:
+    """
+    Estimate how many different words were seen, using a fixed amount of memory however many there are.
+    The relative standard error is 1.04 / sqrt(2 ** precision): the estimate is within that error of the real amount
+    about 68% of the time, within twice that error about 95% of the time.
+    """
+
+    def __init__(self, precision: int = SKETCH_PRECISION):
+        """
+        Initialise the estimate at 0.
+        :param precision: between 4 and 18. The sketch takes 2 ** precision bytes.
+        :raise ValueError: if the precision is out of range.
+        """
+
+        if not 4 <= precision <= 18:
+            raise ValueError("The precision must be between 4 and 18.")
+
+        self.precision = precision
+        self.registers = bytearray(2 ** precision)
+
+    def add(self, hashed: int):
+        """
+        Add a word.
+        :param hashed: the hash of the word, see hash_word.
+        """
+
+        # The first bits choose a register, which remembers the longest run of zeros seen at the start of the rest.
+        index = hashed >> (64 - self.precision)
+        rest = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = 64 - self.precision - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> int:
+        """:return: the estimated amount of different words added."""
+        size = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / size) * size * size / sum(2.0 ** -register for register in self.registers)
+
+        # Small amounts are estimated better from the registers which are still empty.
+        empty = self.registers.count(0)
+        if estimate <= 2.5 * size and empty:
+            estimate = size * math.log(size / empty)
+
+        return round(estimate)
+
+    def error(self) -> float:
+        """:return: the relative standard error of the estimate."""
+        return 1.04 / math.sqrt(len(self.registers))
+
+
+class CountMinSketch:
+    """
+    Estimate the occurrences of each word using a fixed amount of memory however many words there are.
+    An estimate is never lower than the real amount, and with probability confidence it is higher by at most
+    error times the total of all words added.
+    """
+
+    def __init__(self, error: float = SKETCH_ERROR, confidence: float = SKETCH_CONFIDENCE):
+        """
+        Initialise all occurrences at 0.
+        :param error: the maximum overestimate, as a fraction of the total of all words. Each row of the sketch takes
+        about 22 / error bytes, and there are ln(1 / (1 - confidence)) rows: e.g. 1 MB for an error of 0.0001 and a
+        confidence of 0.99.
+        :param confidence: the probability for each estimate to be within the error.
+        :raise ValueError: if the error or the confidence is not between 0 and 1.
+        """
+
+        if not 0 < error < 1 or not 0 < confidence < 1:
+            raise ValueError("The error and the confidence must be between 0 and 1.")
+
+        self.error = error
+        self.confidence = confidence
+        self.width = math.ceil(math.e / error)
+        self.rows = [array.array("q", bytes(8 * self.width)) for _ in range(math.ceil(math.log(1 / (1 - confidence))))]
+        self.total = 0
+
+    def positions(self, hashed: int) -> Iterator[int]:
+        """:return: the position of a word in each row, from its hash (see hash_word)."""
+        first, second = hashed & 0xFFFFFFFF, (hashed >> 32) | 1
+        return ((first + index * second) % self.width for index in range(len(self.rows)))
+
+    def add(self, hashed: int, occurrences: int = 1):
+        """
+        Add the occurrences of a word.
+        :param hashed: the hash of the word, see hash_word.
+        :param occurrences: how many times the word occurs.
+        """
+
+        for row, position in zip(self.rows, self.positions(hashed)):
+            row[position] += occurrences
+        self.total += occurrences
+
+    def count(self, hashed: int) -> int:
+        """
+        Estimate the occurrences of a word.
+        :param hashed: the hash of the word, see hash_word.
+        :return: the estimate.
+        """
+
+        return min(row[position] for row, position in zip(self.rows, self.positions(hashed)))
+
+
+class HeavyHitters:
+    """
+    Find the most common words using a fixed amount of memory (the Misra-Gries algorithm).
+    Every word occurring more than total / (capacity + 1) times is kept, along with its occurrences minus at most
+    total / (capacity + 1).
+    """
+
+    def __init__(self, capacity: int = SKETCH_HEAVY_HITTERS):
+        """
+        Initialise with no words.
+        :param capacity: how many words to find. At most twice as many are kept at any time.
+        """
+
+        self.capacity = capacity
+        self.counts = {}  # Key: word. Value: occurrences, minus at most the total of the decrements.
+        self.decrements = 0  # How much every count was lowered so far to make room for new words.
+
+    def add(self, word: str, occurrences: int = 1):
+        """
+        Add the occurrences of a word.
+        :param word: the word.
+        :param occurrences: how many times the word occurs.
+        """
+
+        self.counts[word] = self.counts.get(word, 0) + occurrences
+
+        if len(self.counts) > 2 * self.capacity:
+            # Lower every count by the one after the capacity, which takes the room of at least half the words at once.
+            threshold = heapq.nlargest(self.capacity + 1, self.counts.values())[-1]
+            self.counts = {word: count - threshold for word, count in self.counts.items() if count > threshold}
+            self.decrements += threshold
+
+
+class WordsSketch:
+    """
+    Count words approximately in a fixed amount of memory, for collections whose vocabulary doesn't fit in memory.
+    Unique words are estimated with a HyperLogLog, the occurrences of each word with a Count-Min Sketch, and the most
+    common words are found with the Misra-Gries algorithm. Words can't be removed once added.
+    """
+
+    def __init__(self, error: float = SKETCH_ERROR, confidence: float = SKETCH_CONFIDENCE,
+                 precision: int = SKETCH_PRECISION, heavy_hitters: int = SKETCH_HEAVY_HITTERS):
+        """
+        Initialise the sketch with no words.
+        :param error: the maximum overestimate of occurrences, as a fraction of the total of all words.
+        :param confidence: the probability for each estimate of occurrences to be within the error.
+        :param precision: the precision of the estimate of unique words, see HyperLogLog.
+        :param heavy_hitters: how many of the most common words can be listed.
+        """
+
+        self.unique = HyperLogLog(precision)
+        self.occurrences = CountMinSketch(error, confidence)
+        self.common = HeavyHitters(heavy_hitters)
+
+    def __repr__(self):
+        """Represent the sketch as its own class name plus its size in bytes."""
+        return f"{self.__class__.__name__}: {self.size()} bytes"
+
+    def size(self) -> int:
+        """:return: the approximate memory taken by the sketch, in bytes."""
+        counters = sum(row.itemsize * len(row) for row in self.occurrences.rows)
+        return len(self.unique.registers) + counters + 100 * len(self.common.counts)
+
+    def add_counts(self, counts: dict):
+        """
+        Add counted words.
+        :param counts: the occurrences of each word.
+        """
+
+        for word, occurrences in counts.items():
+            hashed = hash_word(word)
+            self.unique.add(hashed)
+            self.occurrences.add(hashed, occurrences)
+            self.common.add(word, occurrences)
+
+    def count_unique_words(self) -> int:
+        """:return: the estimated amount of unique words."""
+        return self.unique.count()
+
+    def count_word(self, word: str) -> int:
+        """:return: the estimated occurrences of the word, never lower than the real ones."""
+        return self.occurrences.count(hash_word(word))
+
+    def get_frequency(self, top: int = FREQUENCY_TOP, reverse: bool = False, **options) -> list:
+        """
+        Get the frequency list of the most common words, with their estimated occurrences.
+        :param top: the amount of words to return at most, 0 for all the common words found.
+        :param reverse: must be False, since the least common words are not kept.
+        :param options: further options for the selection (minimum, offset, ties), see select_frequency.
+        :raise ValueError: if the least common words were asked for.
+        :return: a list of ("word", estimated occurrences) in descending order.
+        """
+
+        if reverse:
+            raise ValueError("The least common words are not known in approximate mode.")
+
+        candidates = {word: self.count_word(word) for word in self.common.counts}
+        return select_frequency(candidates, top, **options)
+
+    def bounds(self) -> dict:
+        """
+        :return: the error bounds of the estimates: the relative standard error of unique words, the maximum
+        overestimate of occurrences and its probability, and the occurrences above which a word is sure to be among
+        the common words.
+        """
+
+        total = self.occurrences.total
+        return {
+            "unique_relative_error": self.unique.error(),
+            "occurrences_max_error": math.ceil(self.occurrences.error * total),
+            "occurrences_confidence": self.occurrences.confidence,
+            "common_words_threshold": total // (self.common.capacity + 1),
+        }
+
+    def describe_bounds(self) -> str:
+        """:return: the error bounds of the estimates, in words."""
+        bounds = self.bounds()
+        return (f"Approximate counts: unique words are within {bounds['unique_relative_error']:.2%} of the real amount "
+                f"about 68% of the time (within {2 * bounds['unique_relative_error']:.2%} 95% of the time). "
+                f"Occurrences are never underestimated and are overestimated by at most "
+                f"{bounds['occurrences_max_error']} with {bounds['occurrences_confidence']:.0%} probability. "
+                f"Every word occurring more than {bounds['common_words_threshold']} times is among the most common.")
+
+
+class SpillingCounter:
+    """
+    Count words exactly in a limited amount of memory, for collections whose vocabulary doesn't fit in memory.
+    When the counts in memory grow beyond the budget, they are written to a temporary file sorted by word (a run) and
+    counting starts again from nothing. Results are found by merging the runs and the counts in memory in a single
+    pass, like the last step of a merge sort, and are always the same as counting in memory. Words can't be removed
+    once added.
+    """
+
+    def __init__(self, budget: int = SPILL_BUDGET, directory: Optional[str] = None):
+        """
+        Initialise the counter with no words.
+        :param budget: the memory for the counts, in bytes, estimated at SPILL_WORD_SIZE bytes for each word.
+        :param directory: where to create the temporary directory for the runs. Defaults to the system's one.
+        """
+
+        self.budget = budget
+        self.directory = tempfile.mkdtemp(prefix="uniqword-", dir=directory)
+        weakref.finalize(self, shutil.rmtree, self.directory, True)
+
+        self.counts = collections.Counter()  # The counts in memory, in order of first appearance.
+        self.runs = []  # The paths of the runs, oldest first.
+        self.indexes = []  # For each run, a tuple of the list of words starting its blocks and of their positions.
+        self.numbered = 0  # How many words were spilled, to number words in order of first appearance across runs.
+        self.unique_words_count = None  # Remembered until more words are added.
+
+    def __repr__(self):
+        """Represent the counter as its own class name plus the amount of runs on disk."""
+        return f"{self.__class__.__name__}: {len(self.runs)} runs in {self.directory}"
+
+    def size(self) -> int:
+        """:return: the estimated memory taken by the counts, in bytes."""
+        return len(self.counts) * SPILL_WORD_SIZE
+
+    def add_counts(self, counts: dict):
+        """
+        Add counted words, spilling the counts to disk if they grow beyond the budget.
+        :param counts: the occurrences of each word.
         """
 
-        contents = ""
-
-        if self.file_path.endswith(".pdf"):
-            with open(self.file_path, "rb") as pdf:
-                reader = PyPDF2.PdfFileReader(pdf)  # Create a PDF handler.
-                if reader.isEncrypted and self.password:
-                    # Try to open the file with the given password.
-                    # Will raise NotImplementedError if the algorythm is not supported by PyPDF2.
-                    if reader.decrypt(self.password) == 0:
-                        raise DecryptionError
-                elif reader.isEncrypted and not self.password:
-                    raise DecryptionError
-
-                for page in range(reader.numPages):
-                    current_page = reader.getPage(page)  # Get one page at a time.
-                    contents += current_page.extractText()  # Store the contents.
-        elif self.file_path.endswith(".docx"):
-            raw_document = docx.Document(self.file_path)
-            for paragraph in raw_document.paragraphs:
-                contents += paragraph.text
-        elif self.file_path.endswith(".odt"):
-            odt = zipfile.ZipFile(self.file_path)  # Open the file like a zip archive.
-            # Get the content and take only the raw text.
-            with odt.open('content.xml') as content:
-                for child in etree.parse(content).iter():
-                    if "text" in child.tag and child.text is not None:
-                        # Add each tag's text to the context plus a line break to ensure words don't end up joined.
-                        contents += child.text+"\n"
-        elif self.file_path.endswith(".txt"):
-            with codecs.open(self.file_path) as file:
-                contents = file.read()
-        else:
-            raise ValueError
+        self.counts.update(counts)
+        self.unique_words_count = None
+
+        if self.size() > self.budget:
+            self.spill()
 
-        # Get all to lowercase. This is useful to count unique words, and we don't need case sensitiveness anyway.
-        contents = contents.lower()
+    def spill(self):
+        """Write the counts in memory to a new run and forget them, merging the runs if there are too many."""
+        if not self.counts:
+            return
 
-        # Get individual lines.
-        contents = contents.splitlines()
+        # Sort the positions of the words rather than (word, occurrences) pairs, which would take much more memory.
+        words = list(self.counts)
+        order = sorted(range(len(words)), key=words.__getitem__)
 
-        if self.file_path.endswith(".pdf"):
-            # Eliminate the fake line breaks PDFs have.
-            contents = "".join(contents)
-            # Real line breaks in PDFs automatically get some whitespace, so we don't need to join words using it.
-        else:
-            # Join all words and lines with whitespace, which we'll use to separate individual words.
-            contents = " ".join(contents)
+        path = os.path.join(self.directory, f"{len(self.runs)}.run")
+        self.indexes.append(self.write_run(path, ((words[position], self.counts[words[position]],
+                                                    self.numbered + position) for position in order)))
 
-        all_words = self.purify_words(contents)
+        self.runs.append(path)
+        self.numbered += len(words)
+        self.counts = collections.Counter()
 
-        if len(all_words):  # Avoid adding empty contents.
-            self.file_words = all_words  # Store the list of words in an instance attribute for easy and cheap access.
-            self.file_unique_words.update(all_words)  # Store all unique words in another attribute.
+        if len(self.runs) > SPILL_MERGE_WIDTH:
+            path = os.path.join(self.directory, "merged.run")
+            index = self.write_run(path, self.merge())
+
+            for old in self.runs:
+                os.remove(old)
+            self.runs = [os.path.join(self.directory, "0.run")]
+            self.indexes = [index]
+            os.replace(path, self.runs[0])
 
     @staticmethod
-    def purify_words(contents: str) -> list:
+    def write_run(path: str, entries: Iterable[tuple]) -> tuple:
         """
-        Clean up words by removing empty words, whitespace and symbols.
-        :param contents: the string to purify.
-        :return: a list of purified words.
+        Write a run and index it.
+        :param path: the path of the run.
+        :param entries: the (word, occurrences, number of first appearance) of each word, sorted by word.
+        :return: a tuple of the list of the words starting each block of SPILL_INDEX_STEP words and of their positions
+        in the run, see count_word.
         """
 
-        all_words = []
+        words, positions = [], []
+        with open(path, "wb") as run:
+            for line, (word, occurrences, first) in enumerate(entries):
+                if line % SPILL_INDEX_STEP == 0:
+                    words.append(word)
+                    positions.append(run.tell())
+                run.write(f"{word}\t{occurrences}\t{first}\n".encode("UTF-8"))
 
-        # Separate words.
-        contents = re.split(r"["+SEPARATORS+r"]", contents)
+        return words, positions
 
-        # Filter out "empty" words and filter characters inside words to make sure we only get real(istic) words.
-        for word in filter(lambda w: w not in ["", "\n"], contents):
-            # Get all alphanumeric characters, plus hyphens and underscores.
-            word = [char for char in word if char.isalnum() or char in ACCEPT]
-            while len(word):  # Ensure we're not working on an empty word.
-                # Remove hyphens at start or end.
-                if word[0] in REMOVE:
-                    word.pop(0)
-                    continue
-                if word[-1] in REMOVE:
-                    word.pop(-1)
-                    continue
+    @staticmethod
+    def read_run(path: str) -> Iterator[tuple]:
+        """:return: a generator of (word, occurrences, number of first appearance) from a run, sorted by word."""
+        with open(path, encoding="UTF-8") as run:
+            for line in run:
+                word, occurrences, first = line.split("\t")
+                yield word, int(occurrences), int(first)
+
+    def merge(self) -> Iterator[tuple]:
+        """
+        Merge the runs and the counts in memory, reading each run once and keeping only one line of each in memory.
+        :return: a generator of (word, occurrences, number of first appearance) for every word, sorted by word. Words
+        appeared first in the order of their numbers, which is the order Counter would have kept.
+        """
 
-                # Join together all letters of the word again and make a list of words.
-                all_words.append("".join(word))
-                break
+        words = list(self.counts)
+        memory = ((words[position], self.counts[words[position]], self.numbered + position)
+                  for position in sorted(range(len(words)), key=words.__getitem__))
+        entries = heapq.merge(*map(self.read_run, self.runs), memory, key=operator.itemgetter(0))
 
-        return all_words
+        current = next(entries, None)
+        if current is None:
+            return
 
-    def get_words(self) -> Optional[list]:
+        word, occurrences, first = current
+        for entry in entries:
+            if entry[0] == word:
+                occurrences += entry[1]
+                first = min(first, entry[2])
+            else:
+                yield word, occurrences, first
+                word, occurrences, first = entry
+        yield word, occurrences, first
+
+    def count_unique_words(self) -> int:
+        """:return: the amount of unique words, merging the runs if words were added since the last time."""
+        if self.unique_words_count is None:
+            self.unique_words_count = sum(1 for _ in self.merge())
+
+        return self.unique_words_count
+
+    def count_word(self, word: str) -> int:
+        """:return: the occurrences of the word, reading only the block of each run where the word would be."""
+        occurrences = self.counts[word]
+        for path, (words, positions) in zip(self.runs, self.indexes):
+            block = bisect.bisect_right(words, word) - 1
+            if block < 0:
+                continue  # The word would come before the first word of the run.
+
+            with open(path, "rb") as run:
+                run.seek(positions[block])
+                for _, line in zip(range(SPILL_INDEX_STEP), run):
+                    entry = line.decode("UTF-8").split("\t")
+                    if entry[0] >= word:
+                        if entry[0] == word:
+                            occurrences += int(entry[1])
+                        break
+
+        return occurrences
+
+    def get_frequency(self, top: int = FREQUENCY_TOP, reverse: bool = False, *, minimum: int = 1, offset: int = 0,
+                      ties: bool = False) -> list:
         """
-        Get the list of the file's words.
-        :return: the list of words or None.
+        Get the frequency list of the words in one pass over the runs, keeping only the selected words in memory.
+        The result is always the same as select_frequency's on the same counts in memory.
+        :param top: the amount of words to return at most. 0 returns all words, which must then fit in memory.
+        :param reverse: whether to select the least frequent words instead of the most frequent.
+        :param minimum: the minimum occurrences for a word to be selected.
+        :param offset: how many words to skip before the selection.
+        :param ties: whether to also return the words with the same frequency as the last one, even beyond top.
+        :return: a list of ("word", occurrences) in descending order, or ascending if reversed.
         """
 
-        if len(self.file_words):
-            return self.file_words
+        # Order by frequency, then by first appearance like the stable sorts of select_frequency.
+        def key(entry: tuple) -> tuple:
+            return (entry[1] if reverse else -entry[1]), entry[2]
 
-        return None
+        entries = (entry for entry in self.merge() if entry[1] >= minimum)
+        selection = heapq.nsmallest(offset + top, entries, key=key) if top else sorted(entries, key=key)
 
-    def get_unique_words(self) -> Optional[set]:
-        """:return: a set of the unique words in the chosen file or None if no words are present."""
-        if self.file_unique_words:
-            return self.file_unique_words
+        if ties and top and len(selection) == offset + top:
+            # Add the words tied with the last one which didn't make it into the selection, in their order.
+            _, last, first = selection[-1]
+            selection += sorted((entry for entry in self.merge() if entry[1] == last and entry[2] > first),
+                                key=operator.itemgetter(2))
 
-        return None
+        return [(word, occurrences) for word, occurrences, _ in selection[offset:]]
 
-    def count_all_words(self) -> int:
-        """:return: the count of all words in the chosen file."""
-        if self.words_count is None:
-            self.words_count = len(self.file_words)
+    def close(self):
+        """Delete the runs and forget all words."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.counts = collections.Counter()
+        self.runs = []
+        self.indexes = []
+        self.numbered = 0
+        self.unique_words_count = None
 
-        return self.words_count
 
-    def count_unique_words(self) -> int:
-        """:return: the count of all unique words in the chosen file."""
-        if self.uniques_count is None:
-            self.uniques_count = len(self.get_unique_words())
+def write_aligned(file, data):
+    """
+    Write bytes or an array of numbers to a binary file, little-endian and padded to a multiple of 8 bytes so that
+    arrays can be used in place when the file is mapped in memory.
+    :param file: the binary file to write to.
+    :param data: the bytes or array to write.
+    """
 
-        return self.uniques_count
+    if isinstance(data, array.array) and sys.byteorder == "big":
+        data = array.array(data.typecode, data)
+        data.byteswap()
 
-    def count_word(self, word: str) -> int:
-        """:return: the count of the occurrences of the specified word in the chosen file."""
-        return self.specific_count.setdefault(word, self.file_words.count(word))
+    file.write(data)
+    file.write(bytes(-memoryview(data).nbytes % 8))
 
-    def get_frequency(self) -> collections.Counter:
-        """
-        Get the frequency list of all words in the file.
-        :return: a counter ["word"] = occurrences in descending order.
-        """
 
-        if self.frequency_list is None:
-            frequency_counter = collections.Counter()
+def read_aligned(view: memoryview, offset: int, typecode: str, length: int) -> tuple:
+    """
+    Read an array written by write_aligned.
+    :param view: the view of the whole file, usually mapped in memory.
+    :param offset: where the array starts.
+    :param typecode: the typecode of the array, "B" for bytes.
+    :param length: the amount of items of the array.
+    :raise ValueError: if the file ends before the array does.
+    :return: a tuple of the array and the offset of whatever follows it.
+    """
 
-            for word in self.file_words:
-                frequency_counter[word] += 1
+    numbers = array.array(typecode)
+    end = offset + length * numbers.itemsize
+    if end > len(view):
+        raise ValueError("The file is truncated.")
 
-            self.frequency_list = frequency_counter.most_common()
+    numbers.frombytes(view[offset:end])
+    if sys.byteorder == "big":
+        numbers.byteswap()
 
-        return self.frequency_list
+    return numbers, end + (-end % 8)
 
 
 class FilesCollection:
@@ -232,15 +2283,27 @@ class FilesCollection:
     """
 
     files = {}  # Key: file name. Value: WordsFile instance.
-    collective_words = []
-    collective_unique_words = set()
+    collective_counts = collections.Counter()  # Key: word. Value: occurrences across all files.
     directories = {}  # Key: directory path. Value: list of file paths.
 
-    # Attributes to act as a cache to optimise performance in case of repeated calls.
-    collective_words_count = None
-    collective_uniques_count = None
-    collective_specific_count = {}
-    collective_frequency_list = None
+    # Aggregates kept up to date as files are added and removed.
+    collective_words_count = 0
+
+    # The cache of already read files used when adding directories, if any.
+    cache = None
+
+    # The approximate counts which replace the collective counts in approximate mode, see make_approximate.
+    sketch = None
+
+    # The counts partly kept on disk which replace the collective counts in external mode, see make_external.
+    external = None
+
+    # The sorted vocabulary of the collection, built when first needed and forgotten when the words change.
+    sorted_vocabulary = None
+
+    # The inverted index of the files' words, only kept once built, see build_index.
+    index = None  # Key: word. Value: dictionary of file path: occurrences in the file.
+    positions = None  # Key: word. Value: dictionary of file path: positions of the word in the file.
 
     def __init__(self, *files: Optional[WordsFile]):
         """
@@ -248,6 +2311,10 @@ class FilesCollection:
         :param files: zero or more files to store.
         """
 
+        self.files = {}
+        self.collective_counts = collections.Counter()
+        self.directories = {}
+
         if len(files) == 0:
             return
 
@@ -276,13 +2343,6 @@ class FilesCollection:
         """Return how many files the collection contains."""
         return len(self.files)
 
-    def reset_values(self):
-        """Reset all instance cache variables to force recounting all values."""
-        self.collective_words_count = None
-        self.collective_uniques_count = None
-        self.collective_specific_count = {}
-        self.collective_frequency_list = None
-
     def get_files(self) -> str:
         """Provide the file paths of each file in the collection."""
 
@@ -300,12 +2360,72 @@ class FilesCollection:
             if not isinstance(file, WordsFile):
                 raise TypeError
 
+            if file.file_path in self.files:
+                self.remove_files(file.file_path)  # Replace the old version of the file instead of counting it twice.
+
             # Add the file to the collection using its file_path as index for optimal lookup.
             self.files.update({file.file_path: file})
-            self.collective_words += file.get_words()
-            self.collective_unique_words.update(file.get_words())
+            self.sorted_vocabulary = None
+            if self.index is not None:
+                self.index_file(file)
+
+            # Merge the file's counts into the collective ones, which costs as much as the file's vocabulary.
+            with PROFILER.stage("merge"):
+                if self.sketch is not None:
+                    self.sketch.add_counts(file.file_counts)
+                    file.drop_counts()
+                elif self.external is not None:
+                    self.external.add_counts(file.file_counts)
+                    file.drop_counts()
+                else:
+                    self.collective_counts.update(file.file_counts)
+            self.collective_words_count += file.count_all_words()
+
+    def make_approximate(self, sketch: Optional[WordsSketch] = None):
+        """
+        Count words approximately from now on, in a fixed amount of memory however many different words there are.
+        The words already counted are moved into the sketch and the words of the files are forgotten once counted, so
+        the only files that can be removed afterwards are all of them at once.
+        :param sketch: the sketch to count words in, to choose its accuracy. Defaults to a WordsSketch with the
+        default accuracy.
+        :raise ValueError: if the collection is counted externally.
+        """
+
+        if self.external is not None:
+            raise ValueError("External collections can't become approximate.")
+
+        self.sketch = sketch if sketch is not None else WordsSketch()
+        self.sketch.add_counts(self.collective_counts)
+        self.collective_counts = collections.Counter()
+        self.index = None
+        self.positions = None
+        self.sorted_vocabulary = None
+
+        for file in self.files.values():
+            file.drop_counts()
+
+    def make_external(self, counter: Optional[SpillingCounter] = None):
+        """
+        Count words exactly in a limited amount of memory from now on, keeping the counts which don't fit on disk.
+        The words already counted are moved into the counter and the words of the files are forgotten once counted, so
+        the only files that can be removed afterwards are all of them at once.
+        :param counter: the counter to count words in, to choose its memory budget and directory. Defaults to a
+        SpillingCounter with the default budget.
+        :raise ValueError: if the collection is approximate.
+        """
+
+        if self.sketch is not None:
+            raise ValueError("Approximate collections can't be counted externally.")
+
+        self.external = counter if counter is not None else SpillingCounter()
+        self.external.add_counts(self.collective_counts)
+        self.collective_counts = collections.Counter()
+        self.index = None
+        self.positions = None
+        self.sorted_vocabulary = None
 
-        self.reset_values()
+        for file in self.files.values():
+            file.drop_counts()
 
     def remove_files(self, *file_paths: str) -> int:
         """
@@ -318,56 +2438,284 @@ class FilesCollection:
         if not len(file_paths):
             raise ValueError("No file path to remove was provided.")
 
+        if self.sketch is not None and any(file_path in self.files for file_path in file_paths):
+            if not self.files.keys() <= set(file_paths):
+                raise NotImplementedError("Approximate collections can only remove all their files at once.")
+
+            # Start counting again from nothing.
+            removed = len(self.files)
+            self.files.clear()
+            self.collective_words_count = 0
+            self.sketch = WordsSketch(self.sketch.occurrences.error, self.sketch.occurrences.confidence,
+                                      self.sketch.unique.precision, self.sketch.common.capacity)
+            return removed
+
+        if self.external is not None and any(file_path in self.files for file_path in file_paths):
+            if not self.files.keys() <= set(file_paths):
+                raise NotImplementedError("External collections can only remove all their files at once.")
+
+            removed = len(self.files)
+            self.files.clear()
+            self.collective_words_count = 0
+            self.external.close()
+            self.external = SpillingCounter(self.external.budget, os.path.dirname(self.external.directory))
+            return removed
+
         removed = 0
 
-        for file in file_paths:
-            try:
-                # Remove all words contained in the given file from the collection of words.
-                for word in self.files[file].get_words():
-                    self.collective_words.remove(word)
-                    self.collective_unique_words.discard(word)
-
-                del self.files[file]  # Delete the file itself from the collection.
-                removed += 1
-            finally:
-                # Clean up the cache if at least one file was correctly deleted.
-                if removed > 0:
-                    self.reset_values()
+        for file_path in file_paths:
+            file = self.files.pop(file_path, None)  # Delete the file itself from the collection.
+            if file is None:
+                continue
+
+            if self.index is not None:
+                self.unindex_file(file)
+            self.sorted_vocabulary = None
+
+            # Subtract the file's counts from the collective ones, dropping words no other file contains.
+            for word, occurrences in file.file_counts.items():
+                remaining = self.collective_counts[word] - occurrences
+                if remaining > 0:
+                    self.collective_counts[word] = remaining
+                else:
+                    del self.collective_counts[word]
+
+            self.collective_words_count -= file.count_all_words()
+            removed += 1
 
         return removed
 
-    def add_directories(self, *directories: str) -> list:
+    def build_index(self, positions: bool = False):
+        """
+        Index which files contain each word, to answer questions across files in time proportional to the answer.
+        The index is kept up to date as files are added and removed from now on.
+        :param positions: whether to also index the positions of each word in each file. Only files created with
+        keep_words have positions.
+        :raise ValueError: if the collection is approximate or external, since it doesn't keep the words of its files.
+        """
+
+        if self.sketch is not None or self.external is not None:
+            raise ValueError("Approximate and external collections can't be indexed.")
+
+        self.index = {}
+        self.positions = {} if positions else None
+        for file in self.files.values():
+            self.index_file(file)
+
+    def index_file(self, file: WordsFile):
+        """Add the words of a file to the index."""
+        for word, occurrences in file.file_counts.items():
+            postings = self.index.get(word)
+            if postings is None:
+                postings = self.index[word] = {}
+            postings[file.file_path] = occurrences
+
+        if self.positions is None or file.get_tokens() is None:
+            return
+
+        # Group the positions of each word by its number first, then look each number up only once.
+        numbered = collections.defaultdict(lambda: array.array("I"))
+        for position, token in enumerate(file.get_tokens()):
+            numbered[token].append(position)
+
+        for token, positions in numbered.items():
+            word = file.vocabulary.words[token]
+            postings = self.positions.get(word)
+            if postings is None:
+                postings = self.positions[word] = {}
+            postings[file.file_path] = positions
+
+    def unindex_file(self, file: WordsFile):
+        """Remove the words of a file from the index."""
+        for index in (self.index, self.positions):
+            if index is None:
+                continue
+
+            for word in file.file_counts:
+                postings = index.get(word)
+                if postings is not None and postings.pop(file.file_path, None) is not None and not postings:
+                    del index[word]
+
+    def get_word_files(self, word: str) -> dict:
+        """
+        Find the files containing a word. Builds the index if needed.
+        :param word: the word.
+        :return: a dictionary of the occurrences of the word in each file containing it, by file path.
+        """
+
+        if self.index is None:
+            self.build_index()
+
+        return dict(self.index.get(word, {}))
+
+    def count_word_files(self, word: str) -> int:
+        """:return: how many files contain the word (its document frequency). Builds the index if needed."""
+        if self.index is None:
+            self.build_index()
+
+        return len(self.index.get(word, ()))
+
+    def get_word_positions(self, word: str, file_path: str) -> Optional[array.array]:
+        """
+        Find where a word occurs in a file. Builds the index with positions if needed.
+        :param word: the word.
+        :param file_path: the file path and name.
+        :return: the positions of the word among the words of the file, counting from 0, or None if the file was not
+        created with keep_words. Empty if the file doesn't contain the word.
+        """
+
+        if self.positions is None:
+            self.build_index(positions=True)
+
+        file = self.files.get(file_path)
+        if file is None or file.get_tokens() is None:
+            return None
+
+        return self.positions.get(word, {}).get(file_path, array.array("I"))
+
+    def rank_files(self, *words: str, top: int = FREQUENCY_TOP) -> list:
+        """
+        Rank the files by how relevant they are to some words, by TF-IDF: each word counts as its share of the words
+        of the file, weighted by how rare the word is across files. Builds the index if needed.
+        :param words: the words to rank the files by.
+        :param top: the amount of files to return at most, 0 for all the files containing any of the words.
+        :return: a list of (file path, score) from the most relevant file.
+        """
+
+        if self.index is None:
+            self.build_index()
+
+        scores = {}
+        for word in words:
+            postings = self.index.get(word, {})
+            # A smoothed inverse document frequency, which is never 0 nor undefined.
+            rarity = math.log((1 + len(self.files)) / (1 + len(postings))) + 1
+            for file_path, occurrences in postings.items():
+                share = occurrences / self.files[file_path].count_all_words()
+                scores[file_path] = scores.get(file_path, 0) + share * rarity
+
+        if top:
+            return heapq.nlargest(top, scores.items(), key=operator.itemgetter(1))
+
+        return sorted(scores.items(), key=operator.itemgetter(1), reverse=True)
+
+    def add_directories(self, *directories: str, workers: int = WORKERS, threads: bool = False, max_depth: int = 0,
+                        readahead: int = 0, errors: Optional[Callable[[str, Exception], None]] = None,
+                        **filters) -> list:
         """
         Add the provided directory or directories to the collection by instantiating all files contained therein.
-        Will not add files beginning in .
+        Will not add files beginning in . or files which are already in the collection.
+        Files are read as soon as they are found, while the rest of the directory is still being searched.
         :param directories: the path(s) of each directory to add.
+        :param workers: how many files to read in parallel, see read_files.
+        :param threads: whether to read files with threads instead of processes, see read_files.
+        :param max_depth: how many levels of subdirectories to add. Defaults to 0, only the directory itself.
+        None adds all subdirectories.
+        :param readahead: how many files to read ahead while others are counted, through the asyncio pipeline of
+        add_directories_async. Defaults to 0, reading and counting each file in turn. Use add_directories_async instead
+        from a running event loop.
+        :param errors: a function to call with the path and the error of each file which couldn't be read, instead of
+        raising the error, see read_files.
+        :param filters: further options for selecting files, see discover_files.
         :raise ValueError: if no valid directory is provided.
+        :raise FileNotFoundError: if a directory doesn't exist.
         :return: the list of all files added successfully.
         """
 
         if not len(directories):
             raise ValueError
 
+        if readahead:
+            import asyncio  # Imported only when files are read ahead, to start faster.
+            return asyncio.run(self.add_directories_async(*directories, workers=workers, threads=threads,
+                                                          max_depth=max_depth, readahead=readahead, errors=errors,
+                                                          **filters))
+
         added = []
         for directory in directories:
+            # Ignore files that are already in the collection.
+            file_names = (file_name for file_name in discover_files(directory, max_depth=max_depth, **filters)
+                          if file_name not in self.files)
+
             directory_files = []
-            for file_name in os.listdir(directory):
-                if file_name.endswith(SUPPORTED_FORMATS):
-                    if file_name in self.files.keys():
-                        continue  # Ignore files that are already in the collection.
+            for file in read_files(file_names, workers=workers, threads=threads, cache=self.cache, errors=errors):
+                self.add_files(file)
+                directory_files.append(file.file_path)
+                added.append(file.file_path)
+
+            self.directories.update({directory: directory_files})
+
+        return added
+
+    async def add_directories_async(self, *directories: str, workers: int = WORKERS, threads: bool = False,
+                                    max_depth: int = 0, readahead: int = READAHEAD, queue_size: Optional[int] = None,
+                                    errors: Optional[Callable[[str, Exception], None]] = None, **filters) -> list:
+        """
+        Add the provided directories like add_directories, through the asyncio pipeline of read_files_async: the
+        directories are searched, their files read ahead and counted and the counted files added all at the same time.
+        :param directories: the path(s) of each directory to add.
+        :param workers: how many files to count in parallel.
+        :param threads: whether to count files with threads instead of processes.
+        :param max_depth: how many levels of subdirectories to add, see add_directories.
+        :param readahead: how many files to read ahead while others are counted.
+        :param queue_size: how many files may be in the pipeline at most, see read_files_async.
+        :param errors: a function to call with the path and the error of each file which couldn't be read, see
+        read_files.
+        :param filters: further options for selecting files, see discover_files.
+        :raise ValueError: if no valid directory is provided.
+        :raise FileNotFoundError: if a directory doesn't exist.
+        :return: the list of all files added successfully.
+        """
 
-                    try:
-                        if directory != ".":
-                            file_name = directory+"\\"+file_name
+        if not len(directories):
+            raise ValueError
 
-                        self.add_files(WordsFile(file_name, ""))
+        owners = {}  # Key: path of a file found but not added yet. Value: the directory it was found in.
+
+        def discover() -> Iterator[str]:
+            """Find the files of all directories, one directory after the other."""
+            for directory in directories:
+                self.directories.update({directory: []})
+                try:
+                    for file_name in discover_files(directory, max_depth=max_depth, **filters):
+                        # Ignore files that are already in the collection.
+                        if file_name not in self.files and file_name not in owners:
+                            owners[file_name] = directory
+                            yield file_name
+                except OSError:
+                    del self.directories[directory]
+                    raise
 
-                        directory_files.append(file_name)
-                        added.append(file_name)
-                    except DecryptionError:
-                        pass  # Suppress cases where passworded files are found, ignore them and move on.
+        added = []
+        async for file in read_files_async(discover(), workers=workers, threads=threads, readahead=readahead,
+                                           queue_size=queue_size, cache=self.cache, errors=errors):
+            self.add_files(file)
+            self.directories[owners.pop(file.file_path)].append(file.file_path)
+            added.append(file.file_path)
 
-            self.directories.update({directory: directory_files})
+        return added
+
+    async def add_files_async(self, file_paths: Iterable[str], *, workers: int = WORKERS, threads: bool = False,
+                              readahead: int = READAHEAD, queue_size: Optional[int] = None,
+                              errors: Optional[Callable[[str, Exception], None]] = None) -> list:
+        """
+        Read the provided files through the asyncio pipeline of read_files_async and add them as they are counted.
+        Passworded files are ignored unless errors is given.
+        :param file_paths: the paths of the files to add.
+        :param workers: how many files to count in parallel.
+        :param threads: whether to count files with threads instead of processes.
+        :param readahead: how many files to read ahead while others are counted.
+        :param queue_size: how many files may be in the pipeline at most, see read_files_async.
+        :param errors: a function to call with the path and the error of each file which couldn't be read, see
+        read_files.
+        :return: the list of all files added successfully.
+        """
+
+        added = []
+        async for file in read_files_async(file_paths, workers=workers, threads=threads, readahead=readahead,
+                                           queue_size=queue_size, cache=self.cache, errors=errors):
+            self.add_files(file)
+            added.append(file.file_path)
 
         return added
 
@@ -386,86 +2734,262 @@ class FilesCollection:
         removed = []
         for directory in directories:
             try:
-                for file in self.directories[directory]:
-                    self.remove_files(file)
-                    removed.append(file)
+                for file in self.directories.pop(directory):
+                    if self.remove_files(file):
+                        removed.append(file)
             except KeyError:
                 continue
 
         return removed
 
+    def save(self, file_path: str):
+        """
+        Save the files and directories of the collection, to load them much faster than reading the files again.
+        The saved file holds the words of the collection once, followed by arrays of the numbers of the words of each
+        file and their occurrences, and of the order of the words for files created with keep_words.
+        :param file_path: the path and name of the file to save to.
+        :raise ValueError: if the collection is approximate or external, since it doesn't keep the words of its files.
+        """
+
+        if self.sketch is not None or self.external is not None:
+            raise ValueError("Approximate and external collections can't be saved.")
+
+        words = list(self.collective_counts)
+        numbers = {word: number for number, word in enumerate(words)}
+        typecode = "I" if max(self.collective_counts.values(), default=0) < 2 ** 32 else "Q"
+
+        metadata = json.dumps({
+            "files": [[file.file_path, len(file.file_counts), file.count_all_words(),
+                       None if file.get_tokens() is None else len(file.get_tokens())] for file in self.files.values()],
+            "directories": self.directories,
+        }).encode("UTF-8")
+        vocabulary = "\n".join(words).encode("UTF-8")  # Words never contain whitespace.
+
+        with open(file_path, "wb") as snapshot:
+            snapshot.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION,
+                                                SNAPSHOT_WIDE_COUNTS if typecode == "Q" else 0, 0,
+                                                len(metadata), len(vocabulary)))
+            write_aligned(snapshot, metadata)
+            write_aligned(snapshot, vocabulary)
+            write_aligned(snapshot, array.array(typecode, self.collective_counts.values()))
+
+            for file in self.files.values():
+                write_aligned(snapshot, array.array("I", map(numbers.__getitem__, file.file_counts)))
+                write_aligned(snapshot, array.array(typecode, file.file_counts.values()))
+                if file.get_tokens() is not None:
+                    write_aligned(snapshot, array.array("I", map(numbers.__getitem__, file.get_words() or ())))
+
+    @classmethod
+    def load(cls, file_path: str) -> "FilesCollection":
+        """
+        Load a collection saved with save, without reading any of its files. The saved file is mapped in memory and
+        its arrays are copied as they are, so loading costs about as much as building the dictionaries of counts.
+        :param file_path: the path and name of the saved collection.
+        :raise ValueError: if the file is not a saved collection, or was saved in another version of the format.
+        :return: the loaded collection.
+        """
+
+        collection = cls()
+
+        with open(file_path, "rb") as snapshot:
+            if os.fstat(snapshot.fileno()).st_size < SNAPSHOT_HEADER.size:
+                raise ValueError(f"{file_path} is not a saved collection.")
+
+            with mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ) as mapping, memoryview(mapping) as view:
+                magic, version, flags, _, metadata_length, vocabulary_length = SNAPSHOT_HEADER.unpack_from(view)
+                if magic != SNAPSHOT_MAGIC:
+                    raise ValueError(f"{file_path} is not a saved collection.")
+                if version != SNAPSHOT_VERSION:
+                    raise ValueError(f"{file_path} was saved in version {version} of the format, but only version "
+                                     f"{SNAPSHOT_VERSION} can be loaded.")
+                typecode = "Q" if flags & SNAPSHOT_WIDE_COUNTS else "I"
+
+                metadata, offset = read_aligned(view, SNAPSHOT_HEADER.size, "B", metadata_length)
+                metadata = json.loads(metadata.tobytes())
+                vocabulary, offset = read_aligned(view, offset, "B", vocabulary_length)
+                words = vocabulary.tobytes().decode("UTF-8").split("\n") if vocabulary_length else []
+
+                counts, offset = read_aligned(view, offset, typecode, len(words))
+                collection.collective_counts = collections.Counter(dict(zip(words, counts)))
+
+                translation = None  # The numbers of the saved words in the shared vocabulary, if needed.
+                for path, unique_words_count, words_count, tokens_count in metadata["files"]:
+                    numbers, offset = read_aligned(view, offset, "I", unique_words_count)
+                    counts, offset = read_aligned(view, offset, typecode, unique_words_count)
+                    file = WordsFile.from_counts(path, collections.Counter(dict(zip(map(words.__getitem__, numbers),
+                                                                                    counts))))
+                    file.words_count = words_count
+
+                    if tokens_count is not None:
+                        numbers, offset = read_aligned(view, offset, "I", tokens_count)
+                        if translation is None:
+                            translation = array.array("I", map(VOCABULARY.add, words))
+                        file.file_tokens = array.array("I", map(translation.__getitem__, numbers))
+
+                    collection.files[path] = file
+                    collection.collective_words_count += words_count
+
+        collection.directories = metadata["directories"]
+        return collection
+
+    def merge(self, other: "FilesCollection"):
+        """
+        Add the files and directories of another collection, e.g. one loaded from a file saved on another machine.
+        Files which are in both collections are replaced by the other collection's version.
+        :param other: the collection to merge into this one. Its files are shared, not copied, unless this collection
+        is approximate or external.
+        :raise ValueError: if the other collection is approximate or external, since it doesn't keep the words of
+        its files.
+        :raise NotImplementedError: if this collection is approximate or external and already has some of the files.
+        """
+
+        if other.sketch is not None or other.external is not None:
+            raise ValueError("Approximate and external collections can't be merged.")
+
+        if not self.files and self.sketch is None and self.external is None:
+            # Nothing to add up: take the other collection's counts as they are.
+            self.files = dict(other.files)
+            self.collective_counts = collections.Counter(other.collective_counts)
+            self.collective_words_count = other.collective_words_count
+            self.sorted_vocabulary = None
+            if self.index is not None:
+                self.build_index(self.positions is not None)
+        elif self.sketch is not None or self.external is not None:
+            # The counts of the files are dropped once added, so add copies to leave the other collection's intact.
+            self.add_files(*(WordsFile.from_counts(file.file_path, file.file_counts, file.file_tokens)
+                             for file in other.files.values()))
+        else:
+            self.add_files(*other.files.values())
+
+        for directory, file_paths in other.directories.items():
+            self.directories[directory] = list(dict.fromkeys(self.directories.get(directory, []) + file_paths))
+
     def get_collective_words(self) -> Optional[list]:
-        """:return: the list of all the files' words or None."""
-        if len(self.collective_words):
-            return self.collective_words
+        """:return: the list of all the files' words (see WordsFile.get_words) or None."""
+        if not self.collective_counts:
+            return None
 
-        return None
+        collective_words = []
+        for file in self.files.values():
+            collective_words += file.get_words() or []
+
+        return collective_words
+
+    def get_collective_tokens(self) -> Optional[array.array]:
+        """
+        :return: the numbers of all words in the shared vocabulary, in order, joined from every file which was created
+        with keep_words, or None if there are none.
+        """
+
+        collective_tokens = None
+        for file in self.files.values():
+            if file.get_tokens() is not None:
+                if collective_tokens is None:
+                    collective_tokens = array.array("I")
+                collective_tokens += file.get_tokens()
+
+        return collective_tokens
+
+    def get_sorted_vocabulary(self) -> SortedVocabulary:
+        """
+        :raise ValueError: if the collection is approximate or external, since it doesn't keep its words in memory.
+        :return: the sorted vocabulary of the collection, sorting it if the words changed since the last time.
+        """
+
+        if self.sketch is not None or self.external is not None:
+            raise ValueError("Approximate and external collections don't keep their words in memory.")
+
+        if self.sorted_vocabulary is None:
+            self.sorted_vocabulary = SortedVocabulary(self.collective_counts)
+
+        return self.sorted_vocabulary
+
+    def get_matching_words(self, pattern: str, regex: bool = False) -> dict:
+        """
+        Find the words matching a pattern, in about the time needed to list them.
+        :param pattern: a wildcard pattern like "ban*", "*tion" or "b?n[aeiou]*", see SortedVocabulary.find_matching.
+        :param regex: whether the pattern is a regular expression which whole words must match instead. Regular
+        expressions are checked against every word.
+        :raise ValueError: if the collection is approximate or external.
+        :raise re.error: if the regular expression is not valid.
+        :return: a dictionary of the occurrences of each matching word, in alphabetical order.
+        """
+
+        vocabulary = self.get_sorted_vocabulary()
+        if regex:
+            matches = re.compile(pattern).fullmatch
+            words = [word for word in vocabulary.words if matches(word)]
+        else:
+            words = sorted(vocabulary.find_matching(pattern))
+
+        return {word: self.collective_counts[word] for word in words}
+
+    def count_matching_words(self, pattern: str, regex: bool = False) -> int:
+        """:return: the total occurrences of the words matching a pattern, see get_matching_words."""
+        return sum(self.get_matching_words(pattern, regex).values())
 
     def get_collective_unique_words(self) -> Optional[set]:
-        """:return: a set of the unique words in the collection or None if no words are present."""
-        if self.collective_unique_words:
-            return self.collective_unique_words
+        """
+        :return: a set of the unique words in the collection or None if no words are present, or if the collection
+        is approximate.
+        """
+
+        if self.collective_counts:
+            return set(self.collective_counts)
 
         return None
 
     def count_collective_words(self) -> int:
         """:return: the count of all words in the collection."""
-        if self.collective_words_count is None:
-            self.collective_words_count = len(self.collective_words)
-
         return self.collective_words_count
 
     def count_collective_unique_words(self) -> int:
-        """:return: the count of all unique words in the collection."""
-        if self.collective_uniques_count is None:
-            self.collective_uniques_count = len(self.collective_unique_words)
+        """:return: the count of all unique words in the collection, estimated if the collection is approximate."""
+        if self.sketch is not None:
+            return self.sketch.count_unique_words()
+        if self.external is not None:
+            return self.external.count_unique_words()
 
-        return self.collective_uniques_count
+        return len(self.collective_counts)
 
     def count_collective_word(self, word: str) -> int:
-        """:return: the count of the occurrences of the word in the collection."""
-        return self.collective_specific_count.setdefault(word, self.collective_words.count(word))
+        """
+        :return: the count of the occurrences of the word in the collection. If the collection is approximate, the
+        count is estimated and never lower than the real one.
+        """
 
-    def get_frequency(self, top: int=FREQUENCY_TOP, reverse: bool = False) -> collections.Counter:
-        f"""
-        Get the frequency list of all words in the collection.
-        :param top: the amount of words to return at most. Defaults to {str(FREQUENCY_TOP)}. 0 outputs the whole list.
+        if self.sketch is not None:
+            return self.sketch.count_word(word)
+        if self.external is not None:
+            return self.external.count_word(word)
+
+        return self.collective_counts[word]
+
+    def get_frequency(self, top: int = FREQUENCY_TOP, reverse: bool = False, **options) -> list:
+        """
+        Get the frequency list of the words in the collection.
+        :param top: the amount of words to return at most. Defaults to FREQUENCY_TOP. 0 outputs the whole list.
         :param reverse: whether the frequency list should show the least common items. Defaults to False.
-        :return: a counter ["word"] = occurrences in descending order.
+        :param options: further options for the selection (minimum, offset, ties), see select_frequency.
+        :raise ValueError: if the least common words are asked for in an approximate collection.
+        :return: a list of ("word", occurrences) in descending order, or ascending if reversed. If the collection is
+        approximate, only the most common words are known and their occurrences are estimated, see WordsSketch.
         """
 
         if top is None:
             top = FREQUENCY_TOP
 
-        if self.collective_frequency_list is None:
-            frequency_counter = collections.Counter()
-
-            for word in self.collective_words:
-                frequency_counter[word] += 1
-
-            self.collective_frequency_list = frequency_counter.most_common()
-
-        output = self.collective_frequency_list
-
-        if output is None:
-            return collections.Counter()
-
-        if len(output) == 0:
-            return collections.Counter()
-
-        if reverse:
-            output.reverse()
-
-        if top == 0:
-            top = len(output)
-
-        output = output[:top]
+        if self.sketch is not None:
+            return self.sketch.get_frequency(top, reverse, **options)
+        if self.external is not None:
+            return self.external.get_frequency(top, reverse, **options)
 
-        return output
+        return select_frequency(self.collective_counts, top, reverse=reverse, **options)
 
     def print_stats(self, *, frequency_top: int=0, frequency_reverse: bool = False) -> str:
         """
         Print all useful stats to a file.
+        :raise ValueError: if the least common words are asked for in an approximate collection.
         :return: the name of the file.
         """
 
@@ -487,34 +3011,235 @@ class FilesCollection:
             unique=self.count_collective_unique_words(),
             total=self.count_collective_words()
         )
+        if self.sketch is not None:
+            stats += self.sketch.describe_bounds() + "\n\n"
+
+        # Add stats for frequency.
+        words = self.get_frequency(top=frequency_top, reverse=frequency_reverse)
+        output = []
+
+        # Stuff for string padding.
+        longest_word = max([len(word[0]) for word in words], default=0)
+        if longest_word + 4 <= 60:
+            longest_word += 4
+        else:
+            longest_word = 60
+
+        # Format the output to be easier on the eyes.
+        for entry in words:
+            # Calculate how many tabs to put in depending on the length of the word.
+            output.append(f"{entry[0]:{longest_word}}{entry[1]}")
+
+        stats += "{rev} frequent {amount} {plural}:\n{freq}".format(
+            rev="Least" if frequency_reverse else "Most",
+            amount=len(output),
+            plural="word" if len(output) == 1 else "words",
+            freq="\n".join(output)
+        )
+
+        with open(file_name+".txt", "w", encoding="UTF-8") as file:
+            file.write(stats)
+
+        return file_name
+
+
+class RollingWindow:
+    """
+    Count the most recent words of a stream: the last so many words, the words of the last so many seconds, or both.
+    Adding a word and forgetting an old one both take constant time.
+    """
+
+    def __init__(self, tokens: Optional[int] = None, seconds: Optional[float] = None):
+        """
+        Initialise an empty window.
+        :param tokens: how many of the last words to count, if limited.
+        :param seconds: for how many seconds to count each word, if limited.
+        :raise ValueError: if neither limit is given.
+        """
+
+        if tokens is None and seconds is None:
+            raise ValueError("A window needs a limit of words or seconds.")
+
+        self.tokens = tokens
+        self.seconds = seconds
+        self.counts = collections.Counter()  # Key: word. Value: occurrences in the window.
+        self.entries = collections.deque()  # The words in the window in order of arrival, with their arrival time.
+
+    def __repr__(self):
+        """Represent the window as its limits."""
+        limits = [f"{self.tokens} words"] if self.tokens is not None else []
+        if self.seconds is not None:
+            limits.append(f"{self.seconds:g} seconds")
+
+        return f"{self.__class__.__name__}: last {' and '.join(limits)}"
+
+    def __len__(self):
+        """Return how many words the window contains."""
+        return len(self.entries)
+
+    def add(self, words: Iterable[str], now: Optional[float] = None):
+        """
+        Count new words, forgetting those which left the window.
+        :param words: the new words, in order of arrival.
+        :param now: the time of arrival of the words, as given by time.monotonic(). Defaults to the current time.
+        """
+
+        now = time.monotonic() if now is None else now
+
+        for word in words:
+            self.entries.append((now, word))
+            self.counts[word] += 1
+
+        self.expire(now)
+
+    def expire(self, now: Optional[float] = None):
+        """
+        Forget the words which left the window.
+        :param now: the current time, as given by time.monotonic(). Defaults to the current time.
+        """
+
+        if self.tokens is not None:
+            while len(self.entries) > self.tokens:
+                self.forget()
+
+        if self.seconds is not None:
+            oldest = (time.monotonic() if now is None else now) - self.seconds
+            while self.entries and self.entries[0][0] <= oldest:
+                self.forget()
+
+    def forget(self):
+        """Forget the oldest word of the window."""
+        word = self.entries.popleft()[1]
+
+        remaining = self.counts[word] - 1
+        if remaining > 0:
+            self.counts[word] = remaining
+        else:
+            del self.counts[word]
+
+
+class WordsStream:
+    """
+    Count the words of a stream of text, e.g. the standard input or a named pipe, as each line arrives, both in total
+    and in rolling windows of the most recent words. The counts can be read while the stream is being read by another
+    thread.
+    """
+
+    def __init__(self, name: str, windows: Iterable[RollingWindow] = ()):
+        """
+        Initialise the stream with no words.
+        :param name: the name of the stream, e.g. its file path.
+        :param windows: the windows of recent words to keep.
+        """
+
+        self.name = name
+        self.windows = list(windows)
+        self.counts = collections.Counter()  # Key: word. Value: occurrences since the start of the stream.
+        self.words_count = 0
+        self.lines = 0
+        self.finished = False  # Whether the end of the stream was reached or reading was stopped.
+        self.stopped = False  # Whether reading was asked to stop.
+        self.lock = threading.RLock()
+
+    def __repr__(self):
+        """Represent the stream as its own class name plus its name."""
+        return f"{self.__class__.__name__}: {self.name}"
+
+    def add_line(self, line: str, now: Optional[float] = None):
+        """
+        Count the words of a line.
+        :param line: the line of text. Lines are expected to end in a line break, or to be the last of the stream.
+        :param now: the time of arrival of the line, as given by time.monotonic(). Defaults to the current time.
+        """
+
+        # Lines end in whitespace, so each can be lowercased and purified on its own.
+        words = WordsFile.tokenize(line.lower())
+        now = time.monotonic() if now is None else now
+
+        with self.lock:
+            self.counts.update(words)
+            self.words_count += len(words)
+            self.lines += 1
+            for window in self.windows:
+                window.add(words, now)
+
+    def read(self, source: Iterable[str]):
+        """
+        Count the words of each line of a source as it arrives, until the source ends or stop() is called.
+        :param source: the source of lines, e.g. sys.stdin or an open named pipe.
+        """
+
+        try:
+            for line in source:
+                self.add_line(line)
+                if self.stopped:
+                    break
+        finally:
+            self.finished = True
+
+    def follow(self, file_path: str) -> threading.Thread:
+        """
+        Read a file or named pipe in a background thread. Characters which are not valid UTF-8 are ignored.
+        :param file_path: the path of the file or named pipe.
+        :return: the thread reading it.
+        """
+
+        def read_file():
+            """Read the file, then close it."""
+            with open(file_path, encoding="UTF-8", errors="replace") as source:
+                self.read(source)
+
+        thread = threading.Thread(target=read_file, name=f"uniqword-{file_path}", daemon=True)
+        thread.start()
+
+        return thread
 
-        # Add stats for frequency.
-        words = self.get_frequency(top=frequency_top, reverse=frequency_reverse)
-        output = []
+    def stop(self):
+        """Stop reading once the next line arrives."""
+        self.stopped = True
 
-        # Stuff for string padding.
-        longest_word = max([len(word[0]) for word in words])
-        if longest_word + 4 <= 60:
-            longest_word += 4
-        else:
-            longest_word = 60
+    def get_frequency(self, top: int = FREQUENCY_TOP, reverse: bool = False, window: Optional[int] = None,
+                      **options) -> list:
+        """
+        Get a frequency list of the words seen so far.
+        :param top: the amount of words to return, 0 for all.
+        :param reverse: whether to return the least common words instead of the most common.
+        :param window: the index of the window to list the words of. None lists the words of the whole stream.
+        :param options: further options for the selection, see select_frequency.
+        :return: a list of ("word", occurrences).
+        """
 
-        # Format the output to be easier on the eyes.
-        for entry in words:
-            # Calculate how many tabs to put in depending on the length of the word.
-            output.append(f"{entry[0]:{longest_word}}{entry[1]}")
+        with self.lock:
+            if window is None:
+                return select_frequency(self.counts, top, reverse=reverse, **options)
 
-        stats += "{rev} frequent {amount} {plural}:\n{freq}".format(
-            rev="Least" if frequency_reverse else "Most",
-            amount=len(output),
-            plural="word" if len(output) == 1 else "words",
-            freq="\n".join(output)
-        )
+            self.windows[window].expire()
+            return select_frequency(self.windows[window].counts, top, reverse=reverse, **options)
 
-        with open(file_name+".txt", "w", encoding="UTF-8") as file:
-            file.write(stats)
+    def snapshot(self, top: int = FREQUENCY_TOP) -> dict:
+        """
+        Describe the stream as it is now.
+        :param top: the amount of most common words to list, in total and for each window.
+        :return: a dictionary of the lines, words and unique words read, the most common words and the same for each
+        window, with the description of its limits.
+        """
 
-        return file_name
+        with self.lock:
+            result = {
+                "stream": self.name,
+                "finished": self.finished,
+                "lines": self.lines,
+                "words": self.words_count,
+                "unique": len(self.counts),
+                "frequency": self.get_frequency(top),
+                "windows": [],
+            }
+            for index, window in enumerate(self.windows):
+                frequency = self.get_frequency(top, window=index)
+                result["windows"].append({"tokens": window.tokens, "seconds": window.seconds, "words": len(window),
+                                          "unique": len(window.counts), "frequency": frequency})
+
+        return result
 
 
 class CommandLineInterface(cmd.Cmd):
@@ -524,6 +3249,13 @@ class CommandLineInterface(cmd.Cmd):
     prompt = "uniQword, "
     file = FilesCollection()
 
+    # Options for reading directories in parallel.
+    workers = WORKERS
+    threads = False
+    readahead = 0
+
+    stream = None  # The stream being read in the background, if any.
+
     def check_file(self) -> bool:
         """:return: True if there is at least one  valid file selected, False otherwise."""
         if not self.file:
@@ -531,12 +3263,20 @@ class CommandLineInterface(cmd.Cmd):
             self.onecmd("help add")
             return False
 
-        if self.file.get_collective_words() is None:
+        if self.file.count_collective_words() == 0:
             print(f"The selected file{'s are' if len(self.file) > 1 else ' is'} empty.")
             return False
 
         return True
 
+    @staticmethod
+    def show_progress(done: int, total: int):
+        """Show how many pages of a long document have been read so far."""
+        if total < PDF_PAGES_PER_WORKER:
+            return
+
+        print(f"\rI read {done} of {total} pages...", end="\n" if done == total else "", flush=True)
+
     @staticmethod
     def emptyline(**kwargs):
         """Scold the user for entering an empty command."""
@@ -558,9 +3298,11 @@ class CommandLineInterface(cmd.Cmd):
             Select a file or directory to operate on. You can select multiple items one at a time.
             Please provide a password if needed. Passworded files will be ignored when adding an entire directory.
             To add all compatible files in the current directory, type .
+            To also add the files in all subdirectories, type "recursive" after the directory.
                 Examples:
                     uniQword, add .
                     uniqword, add mydir\folder
+                    uniQword, add mydir recursive
                     uniQword, add myfile.pdf
                     uniQword, add passwordedfile.pdf myp@ssw0rd
         """
@@ -570,41 +3312,50 @@ class CommandLineInterface(cmd.Cmd):
             print("Plase specify something to add! Type \"uniQword, help add\" to receive help.")
             return
 
-        user_entry.strip()  # Remove trailing spaces.
+        user_entry = user_entry.strip()  # Remove trailing spaces.
+        target, _, option = user_entry.partition(" ")
+
+        if not os.path.exists(target):
+            # Guess what was meant from the name, as there is nothing to look at.
+            if "." in target:
+                print("I couldn't find the file you asked for. Please try again.")
+            else:
+                print("I couldn't find the specified directory.")
+            return
 
         # Identify if the user asked for a directory or a file.
-        if user_entry == "." or "." not in user_entry:
+        if os.path.isdir(target):
             try:
-                added = [file for file in self.file.add_directories(user_entry)]
+                added = self.file.add_directories(target, workers=self.workers, threads=self.threads,
+                                                  max_depth=None if option in ["r", "recursive"] else 0,
+                                                  readahead=self.readahead)
                 if len(added):
                     print(f"I successfully added the following file{'' if len(added) == 1 else 's'}:\n" +
                           "\n".join(added))
                 else:
                     print("I couldn't find any compatible file. Please remember to add passworded files individually.")
-            except FileNotFoundError or NotADirectoryError:
+            except (FileNotFoundError, NotADirectoryError):
                 print("I couldn't find the specified directory.")
         else:
-            try:
-                file, password = user_entry.split(" ")
-            except ValueError:
-                file = user_entry
-                password = ""
+            file = target
+            password = option
+
+            if (self.file.sketch is not None or self.file.external is not None) and file in self.file.files:
+                print("I already counted this file, and I can't count it again in approximate or external mode.")
+                return
 
             try:
-                self.file.add_files(WordsFile(file, password))
+                self.file.add_files(WordsFile(file, password, cache=self.file.cache, workers=self.workers,
+                                              progress=self.show_progress))
 
                 print(f"I selected the file: {user_entry}.")
             except FileNotFoundError:
-                if len(file):
-                    print("I couldn't find the file you asked for. Please try again.")
-                else:
-                    print("I need a file name in order to add it!")
-                    self.onecmd("help add")
-            except ValueError:
+                print("I couldn't find the file you asked for. Please try again.")
+            except UnicodeDecodeError:
                 print("I couldn't decode the file. Please save it in UTF-8 before retrying.")
-            except TypeError:
+            except (ValueError, TypeError):  # ValueError is raised for files of unsupported formats.
                 print(f"I cannot use this file. Please convert it to one of the supported formats: "
-                      f"{', '.join(SUPPORTED_FORMATS)}.")
+                      f"{', '.join(READERS)}.")
             except DecryptionError:
                 print("I need the correct password for this file!\n"
                       "Leave an empty space after the file name and type the password, example:\n"
@@ -638,18 +3389,22 @@ class CommandLineInterface(cmd.Cmd):
 
         # Check if the user wants to clear the list.
         if user_entry in ["*"]:
-            removed = 0
-            for file_path in self.file.get_files():
-                removed += self.file.remove_files(file_path)
+            removed = self.file.remove_files(*self.file.get_files())
+            self.file.directories.clear()
 
             print(f"I removed {'the only file' if removed == 1 else 'all '+str(removed)+' files'} from the list.")
             return
 
         # Try to remove a file.
         try:
-            self.file.remove_files(user_entry)
+            removed = self.file.remove_files(user_entry)
+        except NotImplementedError:
+            print("In approximate and external mode I can only remove all files at once, with \"remove *\".")
+            return
+
+        if removed:
             print(f"I removed the file \"{user_entry}\" from the list.")
-        except ValueError:
+        else:
             # If it doesn't work, it may be a directory.
             try:
                 removed = self.file.remove_directories(user_entry)
@@ -673,9 +3428,14 @@ class CommandLineInterface(cmd.Cmd):
         """
         Count the number of words and unique words in the currently selected files.
         Or count how many times a specific word occurs in the currently selected files.
+        Use * for any letters, ? for a single letter and [abc] for one of some letters to count a family of words, or
+        type "re" before a regular expression.
             Example:
                 uniQword, count
                 uniQword, count banana
+                uniQword, count ban*
+                uniQword, count *tion
+                uniQword, count re ban(ana)?s?
         """
 
         if self.check_file() is False:
@@ -683,25 +3443,53 @@ class CommandLineInterface(cmd.Cmd):
 
         user_entry.strip()
 
+        # Check if the user wants to count a family of words.
+        regex = user_entry.startswith("re ")
+        if regex or any(symbol in user_entry for symbol in "*?["):
+            pattern = user_entry[3:].strip() if regex else user_entry.strip().lower()
+            try:
+                matches = self.file.get_matching_words(pattern, regex)
+            except ValueError:
+                print("In approximate and external mode I can only count single words.")
+                return
+            except re.error:
+                print("I couldn't understand this regular expression.")
+                return
+
+            frequency = select_frequency(matches, FREQUENCY_TOP)
+            longest_word = min(max([len(word) for word, _ in frequency], default=0) + 4, 60)
+            output = "".join(f"{word:{longest_word}}{occurrences}\n" for word, occurrences in frequency)
+            print(f"The {'file contains' if len(self.file) == 1 else 'files contain'} "
+                  f"{sum(matches.values())} occurrences of {len(matches)} different words matching \"{pattern}\""
+                  + (f", the most common being:\n{output}" if matches else "."))
+            return
+
         # Check if the user wants to count a specific word.
         if user_entry:
             occurrences = self.file.count_collective_word(user_entry)
 
-            print(f"The file{'' if len(self.file) == 1 else 's'} contain{'' if len(self.file) == 1 else 's'} "
-                  f"{occurrences} occurrences of the word \"{user_entry}\".")
+            print(f"The {'file contains' if len(self.file) == 1 else 'files contain'} "
+                  f"{'about ' if self.file.sketch is not None else ''}{occurrences} occurrences of the word "
+                  f"\"{user_entry}\".")
+            if self.file.sketch is not None:
+                print(self.file.sketch.describe_bounds())
             return
 
         total_words = self.file.count_collective_words()
         total_uniques = self.file.count_collective_unique_words()
 
         print(f"The file{'' if len(self.file) == 1 else 's'} contain{'' if len(self.file) == 1 else 's'} "
-              f"{total_words} total words, {total_uniques} of which unique "
-              f"({round((total_uniques / total_words) * 100, 2)}%).")
+              f"{total_words} total words, {'about ' if self.file.sketch is not None else ''}{total_uniques} of "
+              f"which unique ({round((total_uniques / total_words) * 100, 2)}%).")
+        if self.file.sketch is not None:
+            print(self.file.sketch.describe_bounds())
 
     def do_frequency(self, options: str):
-        f"""
+        """
         Print the frequency list of the current file. It can be printed in reverse and the maximum amount of results can
-        be trimmed. By default, the first {str(FREQUENCY_TOP)} results will be printed. Input * to print all results.
+        be trimmed. By default, the first 20 results will be printed. Input * to print all results.
+        Long lists can be read one page at a time, words below a minimum amount of occurrences can be left out and
+        words tied with the last one can be included.
             Examples:
                 uniQword, frequency
                 uniQword, frequency *
@@ -709,37 +3497,56 @@ class CommandLineInterface(cmd.Cmd):
                 uniQword, frequency reversed
                 uniQword, frequency 50
                 uniQword, frequency 50 reversed
+                uniQword, frequency 50 page 3
+                uniQword, frequency 50 min 10
+                uniQword, frequency 10 ties
         """
 
         if self.check_file() is False:
             return
 
-        try:
-            option_1, option_2 = options.split(" ")
-            option_2.strip()
-        except ValueError:
-            option_1 = options
-            option_2 = None
-
         is_reversed = False
         top = None
+        page = 1
+        minimum = 1
+        ties = False
         output = ""
-        option_1.strip()
 
-        if option_1.isnumeric():
-            top = int(option_1.strip())
-            if option_2 in ["r", "reverse", "reversed"]:
-                is_reversed = True
-        elif "*" in option_1:
-            top = 0
-            if option_2 in ["r", "reverse", "reversed"]:
-                is_reversed = True
-        elif option_1 in ["r", "reverse", "reversed"]:
-            is_reversed = True
-            if "*" in option_2:
+        options = options.split()
+        while options:
+            option = options.pop(0)
+
+            if option.isnumeric():
+                top = int(option)
+            elif "*" in option:
                 top = 0
+            elif option in ["r", "reverse", "reversed"]:
+                is_reversed = True
+            elif option in ["t", "tie", "ties"]:
+                ties = True
+            elif option in ["p", "page", "m", "min", "minimum"] and options and options[0].isnumeric():
+                if option.startswith("p"):
+                    page = max(int(options.pop(0)), 1)
+                else:
+                    minimum = int(options.pop(0))
+            else:
+                print(f"I don't know the option \"{option}\".")
+                self.onecmd("help frequency")
+                return
+
+        if top is None:
+            top = FREQUENCY_TOP
+
+        try:
+            frequency = self.file.get_frequency(top=top, reverse=is_reversed, minimum=minimum,
+                                                offset=(page - 1) * top, ties=ties)
+        except ValueError:
+            print("In approximate mode I only know the most common words.")
+            return
 
-        frequency = self.file.get_frequency(top=top, reverse=is_reversed)
+        if not frequency:
+            print("There are no words to show.")
+            return
 
         # Stuff for string padding.
         longest_word = max([len(word[0]) for word in frequency])
@@ -753,8 +3560,148 @@ class CommandLineInterface(cmd.Cmd):
             # Calculate how many tabs to put in depending on the length of the word.
             output += f"{entry[0]:{longest_word}}{entry[1]}\n"
 
-        print(f"Here are the {'least' if is_reversed else 'most'} common {str(top) if top else str(FREQUENCY_TOP)} "
-              f"elements for the selected document{'' if len(self.file) == 1 else 's'}:\n{output}")
+        print(f"Here are the {'least' if is_reversed else 'most'} common {len(frequency)} "
+              f"elements{f' (page {page})' if page > 1 else ''} "
+              f"for the selected document{'' if len(self.file) == 1 else 's'}:\n{output}")
+        if self.file.sketch is not None:
+            print(self.file.sketch.describe_bounds())
+
+    def do_where(self, user_entry: str):
+        """
+        Find which of the selected files contain a word, and how many times each.
+            Example:
+                uniQword, where banana
+        """
+
+        if self.check_file() is False:
+            return
+
+        word = user_entry.strip().lower()
+        if not word:
+            print("Please tell me which word to look for.")
+            self.onecmd("help where")
+            return
+
+        try:
+            files = self.file.get_word_files(word)
+        except ValueError:
+            print("In approximate and external mode I don't know which files contain each word.")
+            return
+
+        if not files:
+            print(f"None of the files contain the word \"{word}\".")
+            return
+
+        longest_path = min(max(len(file_path) for file_path in files) + 4, 60)
+        output = "".join(f"{file_path:{longest_path}}{occurrences}\n" for file_path, occurrences
+                         in sorted(files.items(), key=operator.itemgetter(1), reverse=True))
+        print(f"The word \"{word}\" occurs in {len(files)} of {len(self.file)} files:\n{output}")
+
+    def do_rank(self, options: str):
+        """
+        List the selected files from the most relevant to some words, by TF-IDF: the more often the words occur in a
+        file compared to its length, and the fewer files contain them, the more relevant the file is.
+        By default, the first 20 files are listed. Type "top N" after the words to list N files, or "top *" for all.
+            Examples:
+                uniQword, rank banana
+                uniQword, rank banana split top 5
+        """
+
+        if self.check_file() is False:
+            return
+
+        words = options.lower().split()
+        top = FREQUENCY_TOP
+        if len(words) >= 2 and words[-2] == "top" and (words[-1].isnumeric() or words[-1] == "*"):
+            top = 0 if words[-1] == "*" else int(words[-1])
+            words = words[:-2]
+
+        if not words:
+            print("Please tell me which words to rank the files by.")
+            self.onecmd("help rank")
+            return
+
+        try:
+            ranking = self.file.rank_files(*words, top=top)
+        except ValueError:
+            print("In approximate and external mode I don't know which files contain each word.")
+            return
+
+        if not ranking:
+            print("None of the files contain these words.")
+            return
+
+        longest_path = min(max(len(file_path) for file_path, _ in ranking) + 4, 60)
+        output = "".join(f"{file_path:{longest_path}}{score:.4f}\n" for file_path, score in ranking)
+        print(f"Here are the {len(ranking)} most relevant files:\n{output}")
+
+    def do_stream(self, options: str):
+        """
+        Count the words of a named pipe (e.g. made with mkfifo and fed by tail -f) as they arrive, while you keep
+        using me. Add "window N" to also count the last N words, and "seconds N" to count the words of the last N
+        seconds. Type "stream" to see the most common words so far, and "stream stop" to stop reading.
+            Examples:
+                uniQword, stream mypipe
+                uniQword, stream mypipe window 1000
+                uniQword, stream mypipe window 1000 seconds 60
+                uniQword, stream
+                uniQword, stream 50
+                uniQword, stream stop
+        """
+
+        options = options.split()
+
+        if not options or options[0].isnumeric():
+            if self.stream is None:
+                print("I am not reading any stream.")
+                return
+
+            snapshot = self.stream.snapshot(int(options[0]) if options else FREQUENCY_TOP)
+            print(f"{'I finished reading' if snapshot['finished'] else 'So far I read'} {snapshot['lines']} lines "
+                  f"from {snapshot['stream']}, with {snapshot['words']} total words, {snapshot['unique']} of which "
+                  f"unique.")
+
+            tables = [("in total", snapshot["frequency"])]
+            for window in snapshot["windows"]:
+                limits = [f"{window['tokens']} words"] if window["tokens"] is not None else []
+                if window["seconds"] is not None:
+                    limits.append(f"{window['seconds']:g} seconds")
+                tables.append((f"in the last {' and '.join(limits)} ({window['words']} words)", window["frequency"]))
+
+            for title, frequency in tables:
+                longest_word = min(max([len(word) for word, _ in frequency], default=0) + 4, 60)
+                output = "".join(f"{word:{longest_word}}{occurrences}\n" for word, occurrences in frequency)
+                print(f"Here are the most common {len(frequency)} elements {title}:\n{output}")
+            return
+
+        if options[0] == "stop":
+            if self.stream is not None:
+                self.stream.stop()
+            print("I will stop reading the stream when its next line arrives.")
+            return
+
+        file_path = options.pop(0)
+        windows = []
+        while options:
+            option = options.pop(0)
+            if option in ["w", "window", "words"] and options and options[0].isnumeric():
+                windows.append(RollingWindow(tokens=int(options.pop(0))))
+            elif option in ["s", "seconds"] and options and options[0].isnumeric():
+                windows.append(RollingWindow(seconds=int(options.pop(0))))
+            else:
+                print(f"I don't know the option \"{option}\".")
+                self.onecmd("help stream")
+                return
+
+        if not os.path.exists(file_path):
+            print("I couldn't find the stream you asked for. Please try again.")
+            return
+
+        if self.stream is not None:
+            self.stream.stop()
+        self.stream = WordsStream(file_path, windows)
+        self.stream.follow(file_path)
+        print(f"I am reading {file_path}. Type \"stream\" to see its most common words.")
 
     def do_print(self, options):
         """
@@ -790,8 +3737,359 @@ class CommandLineInterface(cmd.Cmd):
         elif option_1 in ["r", "reverse", "reversed"]:
             is_reversed = True
 
+        try:
+            file_name = self.file.print_stats(frequency_top=top, frequency_reverse=is_reversed)
+        except ValueError:
+            print("In approximate mode I only know the most common words.")
+            return
+
         print(f"I printed data on {len(self.file)} file{'' if len(self.file) == 1 else 's'} on a file named "
-              f"{self.file.print_stats(frequency_top=top, frequency_reverse=is_reversed)}.")
+              f"{file_name}.")
+
+    def do_save(self, file_path: str):
+        """
+        Save the currently selected files and directories to a file, to load them instantly in another session.
+        The file will be overwritten if already present. Defaults to uniQword.uqw in the current folder.
+            Examples:
+                uniQword, save
+                uniQword, save mycorpus.uqw
+        """
+
+        if self.check_file() is False:
+            return
+
+        file_path = file_path.strip() or "uniQword.uqw"
+        try:
+            self.file.save(file_path)
+        except ValueError:
+            print("In approximate and external mode I don't remember the words of each file, so I can't save them.")
+            return
+        except OSError:
+            print(f"I couldn't write to {file_path}. Please check the path and try again.")
+            return
+
+        print(f"I saved {len(self.file)} file{'' if len(self.file) == 1 else 's'} to {file_path}.")
+
+    def do_load(self, file_path: str):
+        """
+        Load files and directories saved with the save command, without reading them again.
+        They are added to the currently selected ones, so files saved on different computers can be combined.
+        Files which are already selected are replaced by their saved version.
+            Examples:
+                uniQword, load
+                uniQword, load mycorpus.uqw
+        """
+
+        file_path = file_path.strip() or "uniQword.uqw"
+        try:
+            snapshot = FilesCollection.load(file_path)
+            self.file.merge(snapshot)
+        except FileNotFoundError:
+            print("I couldn't find the file you asked for. Please try again.")
+            return
+        except ValueError as error:
+            print(f"I couldn't load the file: {error}")
+            return
+        except NotImplementedError:
+            print("In approximate and external mode I can't replace files I already counted. "
+                  "Please \"remove *\" first.")
+            return
+
+        print(f"I loaded {len(snapshot)} file{'' if len(snapshot) == 1 else 's'} from {file_path}.")
+
+    def do_workers(self, options: str):
+        """
+        Choose how many files to read at the same time when adding a directory, or how many processes may share the
+        pages of a long PDF. More workers are faster on machines with multiple processors. Add "threads" to use threads
+        instead of processes, which is better for plain text files on slow drives. Type "auto" to use one worker per
+        processor.
+            Examples:
+                uniQword, workers
+                uniQword, workers 4
+                uniQword, workers auto
+                uniQword, workers 8 threads
+        """
+
+        options = options.split()
+
+        if not options:
+            amount = "one file per processor"
+            if self.workers:
+                amount = f"{self.workers} file{'' if self.workers == 1 else 's'}"
+            print(f"I am reading {amount} at a time{' using threads' if self.threads else ''}.")
+            return
+
+        if options[0] == "auto":
+            workers = None
+        elif options[0].isnumeric() and int(options[0]) > 0:
+            workers = int(options[0])
+        else:
+            print("Please tell me how many workers to use.")
+            self.onecmd("help workers")
+            return
+
+        self.workers = workers
+        self.threads = len(options) > 1 and options[1] in ["t", "thread", "threads"]
+        self.onecmd("workers")
+
+    def do_readahead(self, options: str):
+        """
+        Choose how many files to read ahead while others are being counted when adding a directory, so that reading
+        and counting happen at the same time. Useful for files on network or slow drives. "off" reads and counts each
+        file in turn.
+            Examples:
+                uniQword, readahead
+                uniQword, readahead 4
+                uniQword, readahead off
+        """
+
+        options = options.strip()
+
+        if not options:
+            if self.readahead:
+                print(f"I am reading {self.readahead} file{'' if self.readahead == 1 else 's'} ahead while counting.")
+            else:
+                print("I am reading and counting each file in turn.")
+            return
+
+        if options == "off":
+            self.readahead = 0
+        elif options.isnumeric():
+            self.readahead = int(options)
+        else:
+            print("Please tell me how many files to read ahead.")
+            self.onecmd("help readahead")
+            return
+
+        self.onecmd("readahead")
+
+    def do_cache(self, options: str):
+        """
+        Remember the words of the files I read, so that I can add them again instantly as long as they don't change.
+        The cache is kept in the .uniqword folder of your user directory unless you choose another directory.
+        Passworded files are never cached.
+        Add "hash" to also compare the contents of files, which is slower but safer on some network drives.
+            Examples:
+                uniQword, cache
+                uniQword, cache on
+                uniQword, cache on mydir/cache
+                uniQword, cache on hash
+                uniQword, cache clear
+                uniQword, cache off
+        """
+
+        options = options.split()
+
+        if not options:
+            if self.file.cache is None:
+                print("The cache is off.")
+            else:
+                print(f"The cache in {self.file.cache.directory} contains {len(self.file.cache)} files.")
+            return
+
+        if options[0] == "on":
+            content_hash = "hash" in options[1:]
+            directory = next((option for option in options[1:] if option != "hash"), CACHE_DIRECTORY)
+            if self.file.cache is not None:
+                self.file.cache.close()
+
+            try:
+                self.file.cache = ExtractionCache(directory, content_hash=content_hash)
+            except (OSError, sqlite3.Error):
+                self.file.cache = None
+                print(f"I couldn't use {directory} for the cache.")
+                return
+        elif options[0] == "off":
+            if self.file.cache is not None:
+                self.file.cache.close()
+            self.file.cache = None
+        elif options[0] == "clear" and self.file.cache is not None:
+            self.file.cache.clear()
+        else:
+            self.onecmd("help cache")
+            return
+
+        self.onecmd("cache")
+
+    def do_approximate(self, options: str):
+        """
+        Count words approximately, in a fixed amount of memory however many different words the files contain. Useful
+        for huge collections whose vocabulary doesn't fit in memory. Counts of unique words and of single words are
+        estimated, and only the most common words can be listed. Files can then only be removed all at once.
+        Choose the accuracy with "error" (the maximum overestimate of occurrences as a fraction of all words, default
+        0.0001) and "top" (how many common words to find, default 1000): more accuracy takes more memory.
+        "off" counts exactly again, and only works once all files are removed.
+            Examples:
+                uniQword, approximate
+                uniQword, approximate on
+                uniQword, approximate on error 0.00001 top 5000
+                uniQword, approximate off
+        """
+
+        options = options.split()
+
+        if not options:
+            if self.file.sketch is None:
+                print("I am counting words exactly.")
+            else:
+                print(f"I am counting words approximately, using about {self.file.sketch.size() // 1024} KB.\n"
+                      f"{self.file.sketch.describe_bounds()}")
+            return
+
+        if options[0] == "on":
+            if self.file.external is not None:
+                print("I am counting words externally. Please turn it off first, with \"external off\".")
+                return
+
+            error = SKETCH_ERROR
+            top = SKETCH_HEAVY_HITTERS
+            options.pop(0)
+            while options:
+                option = options.pop(0)
+                if option == "error" and options and options[0].replace(".", "", 1).isnumeric():
+                    error = float(options.pop(0))
+                elif option == "top" and options and options[0].isnumeric() and int(options[0]) > 0:
+                    top = int(options.pop(0))
+                else:
+                    print(f"I don't know the option \"{option}\".")
+                    self.onecmd("help approximate")
+                    return
+
+            try:
+                self.file.make_approximate(WordsSketch(error, heavy_hitters=top))
+            except ValueError:
+                print("The error must be between 0 and 1.")
+                return
+        elif options[0] == "off":
+            if self.file:
+                print("Please remove all files first, with \"remove *\".")
+                return
+            self.file.sketch = None
+        else:
+            self.onecmd("help approximate")
+            return
+
+        self.onecmd("approximate")
+
+    def do_external(self, options: str):
+        """
+        Count words exactly with a limited amount of memory, keeping the counts which don't fit on disk. Useful for
+        huge collections whose vocabulary doesn't fit in memory: results are the same as usual, but slower to find.
+        Choose the memory in megabytes (default 256) and optionally where to keep the counts on disk (default the
+        system's temporary directory). Files can then only be removed all at once.
+        "off" keeps all counts in memory again, and only works once all files are removed.
+            Examples:
+                uniQword, external
+                uniQword, external on
+                uniQword, external on 1024
+                uniQword, external on 64 mydir
+                uniQword, external off
+        """
+
+        options = options.split(maxsplit=2)
+
+        if not options:
+            if self.file.external is None:
+                print("I am keeping all counts in memory.")
+            else:
+                counter = self.file.external
+                print(f"I am counting words externally, using about {counter.size() // 1024 // 1024} MB out of "
+                      f"{counter.budget // 1024 // 1024} MB, with {len(counter.runs)} "
+                      f"file{'' if len(counter.runs) == 1 else 's'} of counts in {counter.directory}.")
+            return
+
+        if options[0] == "on":
+            if self.file.sketch is not None:
+                print("I am counting words approximately. Please turn it off first, with \"approximate off\".")
+                return
+            if len(options) > 1 and not options[1].isnumeric():
+                self.onecmd("help external")
+                return
+
+            budget = int(options[1]) * 1024 * 1024 if len(options) > 1 else SPILL_BUDGET
+            if self.file.external is not None:
+                if len(options) > 2:
+                    print("I can only keep the counts in another directory once all files are removed, with "
+                          "\"remove *\".")
+                    return
+                self.file.external.budget = budget  # The counts already on disk stay where they are.
+            else:
+                try:
+                    self.file.make_external(SpillingCounter(budget, options[2] if len(options) > 2 else None))
+                except OSError:
+                    print("I couldn't create my files in the directory you asked for. Please check it and try again.")
+                    return
+        elif options[0] == "off":
+            if self.file:
+                print("Please remove all files first, with \"remove *\".")
+                return
+            if self.file.external is not None:
+                self.file.external.close()
+            self.file.external = None
+        else:
+            self.onecmd("help external")
+            return
+
+        self.onecmd("external")
+
+    def do_profile(self, options: str):
+        """
+        Find out what makes reading files slow. Turn profiling on, add some files, then type "profile" to see how long
+        each stage of reading took and which files were the slowest. Add "memory" to also measure the memory needed,
+        which makes reading slower. Files read by multiple workers at once are only partly measured, so set workers
+        to 1 first for the full picture.
+        You can also profile a single command in detail: "cpu" shows the functions which took the longest, "memory"
+        the lines which allocated the most memory.
+            Examples:
+                uniQword, profile on
+                uniQword, profile on memory
+                uniQword, profile
+                uniQword, profile 20
+                uniQword, profile clear
+                uniQword, profile off
+                uniQword, profile cpu add mydir
+                uniQword, profile memory frequency 100
+        """
+
+        option, _, command = options.strip().partition(" ")
+
+        if not option or option.isnumeric():
+            if not PROFILER.stages:
+                print(f"I haven't measured anything yet{'' if PROFILER.enabled else ', type profile on to start'}.")
+                return
+
+            print(PROFILER.report(int(option) if option else 10))
+        elif option == "on":
+            PROFILER.stop()
+            PROFILER.start(memory=command.strip() == "memory")
+            print(f"I am measuring the time{' and memory' if PROFILER.memory else ''} needed to read files.")
+        elif option == "off":
+            PROFILER.stop()
+            print("I stopped measuring.")
+        elif option == "clear":
+            PROFILER.clear()
+            print("I forgot all measures.")
+        elif option == "cpu" and command:
+            profile = cProfile.Profile()
+            profile.runcall(self.onecmd, command)
+            pstats.Stats(profile, stream=sys.stdout).sort_stats("cumulative").print_stats(25)
+        elif option == "memory" and command:
+            tracing = tracemalloc.is_tracing()
+            if not tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            self.onecmd(command)
+
+            peak = tracemalloc.get_traced_memory()[1]
+            statistics = tracemalloc.take_snapshot().statistics("lineno")
+            if not tracing:
+                tracemalloc.stop()
+
+            print(f"The command needed up to {peak / 1024 / 1024:.2f} MB. The lines holding the most memory now are:")
+            for statistic in statistics[:10]:
+                print(f"    {statistic}")
+        else:
+            self.onecmd("help profile")
 
     @staticmethod
     def do_bye(arg):
@@ -810,5 +4108,314 @@ class CommandLineInterface(cmd.Cmd):
         pass
 
 
+class BatchInterface:
+    """
+    Run a single command on the given files without any interaction, for scripts and other programs.
+        Examples:
+            uniqword.py count myfile.txt mydir
+            uniqword.py count --word banana --word apple mydir --recursive
+            uniqword.py frequency --top 50 --reverse --format csv mydir
+            uniqword.py stats --format json --workers 8 mydir myfile.pdf
+            uniqword.py count --save first.uqw mydir
+            uniqword.py frequency --load first.uqw --load second.uqw
+            uniqword.py frequency --memory 512 --recursive hugedir
+            uniqword.py count --readahead 8 --workers 4 //server/share/corpus
+            tail -f chat.log | uniqword.py stream --window 1000 --seconds 60 --every 10
+    """
+
+    # Exit codes.
+    SUCCESS = 0
+    FAILURE = 1  # Some files couldn't be read. The results for the other files are still given.
+
+    def __init__(self, arguments: Optional[list] = None):
+        """
+        Read the command and its options.
+        :param arguments: the command-line arguments, without the program name. Defaults to the program's arguments.
+        """
+
+        self.options = self.build_parser().parse_args(arguments)
+        self.failed = False
+
+    @classmethod
+    def build_parser(cls) -> argparse.ArgumentParser:
+        """:return: the parser for the command-line arguments."""
+        parser = argparse.ArgumentParser(prog="uniqword.py", description=__doc__,
+                                         epilog="Run without arguments for the interactive interface.")
+        commands = parser.add_subparsers(dest="command", required=True)
+
+        # Options common to all commands.
+        common = argparse.ArgumentParser(add_help=False)
+        common.add_argument("paths", nargs="*", help="files and directories to read")
+        common.add_argument("--format", choices=["text", "json", "csv"], default="text", help="output format")
+        common.add_argument("--password", default="", help="password for the passworded files given by name")
+        common.add_argument("--recursive", action="store_true", help="also read the subdirectories of directories")
+        common.add_argument("--include", action="append", default=[], metavar="PATTERN",
+                            help="only read the files of directories matching this glob pattern")
+        common.add_argument("--exclude", action="append", default=[], metavar="PATTERN",
+                            help="skip the files and subdirectories matching this glob pattern")
+        common.add_argument("--workers", type=int, default=WORKERS,
+                            help="how many files to read at the same time, 0 for one per processor")
+        common.add_argument("--threads", action="store_true", help="read files with threads instead of processes")
+        common.add_argument("--readahead", type=int, default=0, metavar="FILES",
+                            help="read this many files ahead while others are counted, for slow or network drives")
+        common.add_argument("--cache", nargs="?", const=CACHE_DIRECTORY, metavar="DIRECTORY",
+                            help="remember the words of files to read them instantly next time")
+        common.add_argument("--approximate", action="store_true",
+                            help="estimate the counts in a fixed amount of memory, for huge vocabularies")
+        common.add_argument("--error", type=float, default=SKETCH_ERROR,
+                            help="maximum overestimate of approximate occurrences, as a fraction of all words")
+        common.add_argument("--memory", type=int, metavar="MEGABYTES",
+                            help="count exactly with about this much memory for the counts, keeping the rest in "
+                                 "temporary files, for huge vocabularies")
+        common.add_argument("--load", action="append", default=[], metavar="FILE",
+                            help="start from the files saved in FILE instead of reading them, can be repeated")
+        common.add_argument("--save", metavar="FILE", help="save the counts of the files to FILE to --load them later")
+
+        count = commands.add_parser("count", parents=[common], help="count all words and unique words")
+        count.add_argument("--word", action="append", default=[],
+                           help="count the occurrences of this word instead, or of the words matching a pattern like "
+                                "ban* or *tion")
+
+        for name, description in [("frequency", "list the most or least common words"),
+                                  ("stats", "give the counts for each file plus the frequency list")]:
+            command = commands.add_parser(name, parents=[common], help=description)
+            command.add_argument("--top", type=int, default=FREQUENCY_TOP, help="how many words to list, 0 for all")
+            command.add_argument("--reverse", action="store_true", help="list the least common words")
+            command.add_argument("--min", type=int, default=1, dest="minimum", help="minimum occurrences of words")
+            command.add_argument("--page", type=int, default=1, help="which page of --top words to list")
+            command.add_argument("--ties", action="store_true", help="also list words tied with the last one")
+
+        stream = commands.add_parser("stream", help="count the words of the standard input or a named pipe as they "
+                                                    "arrive, in total and in windows of the most recent words")
+        stream.add_argument("source", nargs="?", default="-", help="named pipe or file to read, - for standard input")
+        stream.add_argument("--window", type=int, action="append", default=[], metavar="WORDS",
+                            help="also count the last WORDS words, can be repeated")
+        stream.add_argument("--seconds", type=float, action="append", default=[],
+                            help="also count the words of the last SECONDS seconds, can be repeated")
+        stream.add_argument("--every", type=float, default=0, metavar="SECONDS",
+                            help="write the most common words this often while reading, 0 only at the end")
+        stream.add_argument("--top", type=int, default=FREQUENCY_TOP, help="how many words to list, 0 for all")
+        stream.add_argument("--format", choices=["text", "json", "csv"], default="text",
+                            help="output format, JSON writes one line per snapshot")
+
+        return parser
+
+    def run(self) -> int:
+        """
+        Read the files, run the command and write its results to the standard output.
+        :return: the exit code.
+        """
+
+        if self.options.command == "stream":
+            return self.command_stream()
+
+        if not self.options.paths and not self.options.load:
+            self.build_parser().error("give at least one file or directory to read, or --load")
+
+        try:
+            collection = self.load()
+            result, header, rows = getattr(self, f"command_{self.options.command}")(collection)
+        except ValueError as error:
+            self.fail(str(error))
+            return self.FAILURE
+
+        if collection.sketch is not None:
+            if isinstance(result, dict):
+                result["error_bounds"] = collection.sketch.bounds()
+            if self.options.format != "json" or not isinstance(result, dict):
+                print(collection.sketch.describe_bounds(), file=sys.stderr)
+
+        self.write(result, header, rows)
+
+        if self.options.save is not None:
+            try:
+                collection.save(self.options.save)
+            except (OSError, ValueError) as error:
+                self.fail(f"{self.options.save}: {error.__class__.__name__} {error}".rstrip())
+
+        return self.FAILURE if self.failed else self.SUCCESS
+
+    def fail(self, message: str):
+        """Report a problem on the standard error without stopping."""
+        print(f"uniqword.py: {message}", file=sys.stderr)
+        self.failed = True
+
+    def load(self) -> FilesCollection:
+        """:return: a collection of all the requested files and directories."""
+        collection = FilesCollection()
+        if self.options.cache is not None:
+            collection.cache = ExtractionCache(self.options.cache)
+        if self.options.approximate:
+            collection.make_approximate(WordsSketch(self.options.error))
+        if self.options.memory is not None:
+            collection.make_external(SpillingCounter(self.options.memory * 1024 * 1024))
+
+        for file_path in self.options.load:
+            try:
+                collection.merge(FilesCollection.load(file_path))
+            except (OSError, ValueError, NotImplementedError) as error:
+                self.fail(f"{file_path}: {error.__class__.__name__} {error}".rstrip())
+
+        workers = self.options.workers or None
+        file_paths = []
+
+        for path in self.options.paths:
+            if os.path.isdir(path):
+                try:
+                    collection.add_directories(path, workers=workers, threads=self.options.threads,
+                                               max_depth=None if self.options.recursive else 0,
+                                               readahead=self.options.readahead, errors=self.report,
+                                               include=self.options.include, exclude=self.options.exclude)
+                except OSError as error:
+                    self.report(path, error)
+            elif os.path.isfile(path):
+                file_paths.append(path)
+            else:
+                self.fail(f"{path}: no such file or directory")
+
+        if self.options.password:
+            # Passworded files need their password, so they are read one at a time.
+            for file_path in file_paths:
+                try:
+                    collection.add_files(WordsFile(file_path, self.options.password, workers=workers))
+                except Exception as error:
+                    self.report(file_path, error)
+            return collection
+
+        if self.options.readahead:
+            import asyncio  # Imported only when files are read ahead, to start faster.
+            asyncio.run(collection.add_files_async(file_paths, workers=workers, threads=self.options.threads,
+                                                   readahead=self.options.readahead, errors=self.report))
+        else:
+            for file in read_files(file_paths, workers=workers, threads=self.options.threads, cache=collection.cache,
+                                   errors=self.report):
+                collection.add_files(file)
+
+        return collection
+
+    def report(self, file_path: str, error: Exception):
+        """Report a file which couldn't be read on the standard error, see read_files."""
+        if isinstance(error, DecryptionError):
+            self.fail(f"{file_path}: the file is passworded, use --password")
+        else:
+            self.fail(f"{file_path}: {error.__class__.__name__} {error}".rstrip())
+
+    def command_count(self, collection: FilesCollection) -> tuple:
+        """:return: the counts of all words and unique words, or of the requested words."""
+        if self.options.word:
+            counts = {word: collection.count_matching_words(word.lower()) if any(symbol in word for symbol in "*?[")
+                      else collection.count_collective_word(word.lower()) for word in self.options.word}
+            return counts, ["word", "count"], list(counts.items())
+
+        result = {
+            "files": len(collection),
+            "words": collection.count_collective_words(),
+            "unique": collection.count_collective_unique_words(),
+        }
+        return result, list(result), [list(result.values())]
+
+    def command_frequency(self, collection: FilesCollection) -> tuple:
+        """:return: the frequency list."""
+        frequency = collection.get_frequency(top=self.options.top, reverse=self.options.reverse,
+                                             minimum=self.options.minimum,
+                                             offset=(max(self.options.page, 1) - 1) * self.options.top,
+                                             ties=self.options.ties)
+
+        return [{"word": word, "count": count} for word, count in frequency], ["word", "count"], frequency
+
+    def command_stats(self, collection: FilesCollection) -> tuple:
+        """:return: the counts of each file and of all of them, plus the frequency list."""
+        files = [{"path": file.file_path, "words": file.count_all_words(), "unique": file.count_unique_words()}
+                 for file in collection.files.values()]
+        frequency, _, _ = self.command_frequency(collection)
+
+        result = {
+            "files": files,
+            "words": collection.count_collective_words(),
+            "unique": collection.count_collective_unique_words(),
+            "frequency": frequency,
+        }
+        rows = [list(file.values()) for file in files]
+        rows.append(["*", result["words"], result["unique"]])
+
+        return result, ["path", "words", "unique"], rows
+
+    def command_stream(self) -> int:
+        """
+        Read the stream until it ends or the program is interrupted, writing the most common words periodically and
+        at the end.
+        :return: the exit code.
+        """
+
+        windows = [RollingWindow(tokens=tokens) for tokens in self.options.window]
+        windows += [RollingWindow(seconds=seconds) for seconds in self.options.seconds]
+
+        if self.options.source == "-":
+            stream = WordsStream("<stdin>", windows)
+            sys.stdin.reconfigure(errors="replace")
+            reader = threading.Thread(target=stream.read, args=(sys.stdin,), daemon=True)
+            reader.start()
+        elif os.path.exists(self.options.source):
+            stream = WordsStream(self.options.source, windows)
+            reader = stream.follow(self.options.source)
+        else:
+            self.fail(f"{self.options.source}: no such file or directory")
+            return self.FAILURE
+
+        try:
+            while reader.is_alive():
+                reader.join(self.options.every or None)
+                if reader.is_alive():
+                    self.write_snapshot(stream)
+        except KeyboardInterrupt:
+            stream.stop()
+
+        self.write_snapshot(stream)
+
+        return self.SUCCESS
+
+    def write_snapshot(self, stream: WordsStream):
+        """Write the most common words of a stream, in total and in each window."""
+        snapshot = stream.snapshot(self.options.top)
+
+        scopes = [("total", snapshot["frequency"])]
+        for window in snapshot["windows"]:
+            limit = f"{window['tokens']} words" if window["tokens"] is not None else f"{window['seconds']:g} seconds"
+            scopes.append((f"last {limit}", window["frequency"]))
+
+        rows = [[scope, word, occurrences] for scope, frequency in scopes for word, occurrences in frequency]
+        if self.options.format == "text":
+            print(f"{snapshot['lines']} lines, {snapshot['words']} words, {snapshot['unique']} unique")
+
+        self.write(snapshot, ["scope", "word", "count"], rows)
+        if self.options.format == "text":
+            print()
+        sys.stdout.flush()
+
+    def write(self, result, header: list, rows: list):
+        """
+        Write the results in the requested format.
+        :param result: the results for the JSON format.
+        :param header: the names of the columns for the CSV and text formats.
+        :param rows: the rows for the CSV and text formats.
+        """
+
+        if self.options.format == "json":
+            json.dump(result, sys.stdout, ensure_ascii=False)
+            sys.stdout.write("\n")
+        elif self.options.format == "csv":
+            writer = csv.writer(sys.stdout)
+            writer.writerow(header)
+            writer.writerows(rows)
+        else:
+            # Pad each column to its longest value to be easier on the eyes.
+            widths = [max(len(str(row[column])) for row in rows + [header]) + 4 for column in range(len(header))]
+            for row in [header] + rows:
+                sys.stdout.write("".join(f"{str(value):{width}}" for value, width in zip(row, widths)).rstrip() + "\n")
+
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(BatchInterface().run())
+
     CommandLineInterface().cmdloop()